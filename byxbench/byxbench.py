@@ -0,0 +1,170 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, RawDescriptionHelpFormatter
+from pathlib import Path
+from statistics import median
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_HISTORY = Path(__file__).resolve().parent / 'history.jsonl'
+
+# Versions oldest to newest, the last entry of each tool is the current one and is checked against the one before it
+VERSIONS = {
+    'byxhash': ['byxhash_v1.py', 'byxhash_v2.py', 'byxhash.py'],
+    'byxpgen': ['byxpgen_v1.py', 'byxpgen_v2.py', 'byxpgen.py'],
+}
+
+# Workload name -> argv per version, None where a version lacks the feature
+WORKLOADS = {
+    'byxhash': {
+        'startup': {version: ['--help'] for version in VERSIONS['byxhash']},
+        'single-hash': {version: ['-q', 'SuperSecurePassword'] for version in VERSIONS['byxhash']},
+    },
+    'byxpgen': {
+        'startup': {version: ['--help'] for version in VERSIONS['byxpgen']},
+        'passwords': {version: ['-c', '100000'] for version in VERSIONS['byxpgen']},
+        'passphrases': {
+            'byxpgen_v1.py': None,
+            'byxpgen_v2.py': ['-p', '-c', '10000', '-W', str(REPO_DIR / 'byxpgen' / 'wordlist.txt')],
+            'byxpgen.py': ['-p', '-c', '10000', '-W', str(REPO_DIR / 'byxpgen' / 'wordlist.txt')],
+        },
+    },
+}
+
+def get_args():
+    parser = ArgumentParser(
+        description='Cross-version performance regression harness for byxhash and byxpgen',
+        epilog='Developed for Yuki, by Yuki, Always and Forever',
+        formatter_class=RawDescriptionHelpFormatter
+    )
+    group =(
+        parser.add_mutually_exclusive_group()
+    )
+    parser.usage =(
+        'Basic Usage: -t (Tool), -r (Repeat), -T (Tolerance), -H (History), -v (Verbosity)'
+    )
+    parser.add_argument(
+        '-t', '--tool', type=str, action='append', choices=list(VERSIONS),
+        help='Tool to measure, repeat for several (default: all)'
+    )
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=5,
+        help='Runs per workload and version, the median is kept (default: 5)'
+    )
+    parser.add_argument(
+        '-T', '--tolerance', type=float, default=0.10,
+        help='Allowed slowdown of the current version against the previous one (default: 0.10)'
+    )
+    parser.add_argument(
+        '-H', '--history', type=str, metavar='FILE', default=str(DEFAULT_HISTORY),
+        help='JSON lines file the timings are appended to (default: byxbench/history.jsonl)'
+    )
+    parser.add_argument(
+        '--no-history', action='store_true',
+        help='Do not record this run in the history file'
+    )
+    group.add_argument(
+        '-q', '--quiet', action='store_true',
+        help='Quiet mode, only output regressions'
+    )
+    group.add_argument(
+        '-v', '--verbose', action='count', default=0,
+        help='Add Verbosity (-v for every single run)'
+    )
+    return parser.parse_args()
+
+
+def time_command(argv, workdir, env): # Wall time of one run in seconds, output is discarded and stdin is empty so byxpgen does not wait on it
+    start = time.perf_counter()
+    completed = subprocess.run(
+        argv, cwd=workdir, env=env,
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} exited with {completed.returncode}: {completed.stderr.decode(errors='replace').strip()}")
+    return elapsed
+
+
+def measure_tool(tool, args, workdir, env): # Median seconds per workload and version, {workload: {version: seconds}}
+    timings = {}
+    for workload, commands in WORKLOADS[tool].items():
+        timings[workload] = {}
+        for version in VERSIONS[tool]:
+            extra = commands.get(version)
+            if extra is None:
+                continue
+            argv = [sys.executable, str(REPO_DIR / tool / version)] + extra
+            runs = [time_command(argv, workdir, env) for _ in range(max(1, args.repeat))]
+            timings[workload][version] = median(runs)
+            if args.verbose >= 1:
+                print(f"{tool:<8} {workload:<12} {version:<14} " + ' '.join(f"{run * 1000:.1f}" for run in runs) + ' ms')
+    return timings
+
+
+def find_regressions(tool, timings, tolerance): # Current version against the one before it, for every workload both can run
+    regressions = []
+    current = VERSIONS[tool][-1]
+    for workload, results in timings.items():
+        if current not in results:
+            continue
+        previous = [version for version in VERSIONS[tool][:-1] if version in results]
+        if not previous:
+            continue
+        baseline = results[previous[-1]]
+        if results[current] > baseline * (1 + tolerance):
+            regressions.append((workload, previous[-1], baseline, results[current]))
+    return regressions
+
+
+def append_history(path, tools): # One JSON object per run, so the file can be diffed and plotted over time
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'tools': tools,
+    }
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def main():
+    args = get_args()
+    tools = args.tool or list(VERSIONS)
+
+    results = {}
+    regressions = []
+    with tempfile.TemporaryDirectory(prefix='byxbench-') as workdir: # Keeps stray output files and byxhash's cache out of the repo
+        env = dict(os.environ, XDG_CACHE_HOME=workdir)
+        try:
+            for tool in tools:
+                results[tool] = measure_tool(tool, args, workdir, env)
+                regressions += [(tool,) + regression for regression in find_regressions(tool, results[tool], args.tolerance)]
+        except (OSError, RuntimeError) as e:
+            print(f"Error running benchmark: {e}")
+            sys.exit(1)
+
+    if not args.quiet:
+        for tool in tools:
+            for workload, timings in results[tool].items():
+                print(f"{tool:<8} {workload:<12} " + '  '.join(f"{version}: {seconds * 1000:.1f} ms" for version, seconds in timings.items()))
+
+    for tool, workload, previous, baseline, current in regressions:
+        print(f"REGRESSION {tool} {workload}: {VERSIONS[tool][-1]} {current * 1000:.1f} ms vs {previous} {baseline * 1000:.1f} ms")
+
+    if not args.no_history:
+        try:
+            append_history(args.history, results)
+        except IOError as e:
+            print(f"\nError saving to file: {e}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
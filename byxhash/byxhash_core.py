@@ -0,0 +1,3076 @@
+import errno
+import io
+import os
+import stat
+import struct
+import sys
+import threading
+import time
+from argparse import ArgumentParser, ArgumentTypeError, RawDescriptionHelpFormatter
+from binascii import b2a_base64, hexlify
+from bisect import bisect_left
+from collections import deque
+from itertools import chain, repeat
+from functools import lru_cache, partial
+from hashlib import blake2b, blake2s, sha256
+# pathlib, contextlib, resource, asyncio, sqlite3, concurrent.futures, json and friends are imported inside the functions that use them, keeping startup near byxhash_v2
+
+__all__ = ['Hasher', 'get_hash_function', 'hash_file', 'hash_many', 'hash_stream']
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024 # 1 MiB, large enough to amortise syscalls, small enough to stay in cache
+
+MAX_DIGEST_SIZES = {'blake2b': 64, 'blake2s': 32, 'sha256': 32}
+
+DEFAULT_CACHE_ENTRIES = 1000000
+
+RACY_WINDOW_NS = 2 * 10 ** 9 # Files modified this recently are not cached, a same-tick rewrite would keep its mtime
+
+CACHE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS hashes (
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    algorithm TEXT NOT NULL,
+    digest_size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    path TEXT NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (device, inode, algorithm, digest_size)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS hashes_digest ON hashes (digest);
+CREATE INDEX IF NOT EXISTS hashes_last_used ON hashes (last_used);
+'''
+
+DUPLICATE_PARTIAL_SIZE = 4096 # '--find-duplicates', Head and tail bytes compared before any file is read in full
+
+# '--find-duplicates', Scratch database in a temporary file, so memory stays flat however many files are scanned
+DUPLICATES_SCHEMA = '''
+CREATE TABLE files (path BLOB NOT NULL, size INTEGER NOT NULL, node BLOB NOT NULL);
+CREATE INDEX files_size ON files (size, node);
+CREATE INDEX files_node ON files (node);
+CREATE TABLE partials (node BLOB PRIMARY KEY, size INTEGER NOT NULL, digest TEXT NOT NULL, complete INTEGER NOT NULL);
+CREATE TABLE fulls (node BLOB PRIMARY KEY, size INTEGER NOT NULL, digest TEXT NOT NULL);
+CREATE INDEX fulls_digest ON fulls (size, digest);
+'''
+
+DEFAULT_LEAF_SIZE = 4 * 1024 * 1024
+
+TREE_CONSTRUCTORS = {'blake2b': blake2b, 'blake2s': blake2s}
+
+# '--incremental', Checkpoint sidecar: CHECKPOINT_HEADER (magic, algorithm, digest size, leaf size, device, inode, leaf count,
+# big-endian) followed by that many raw '--tree' leaf digests, each hashed as a non-final leaf
+CHECKPOINT_HEADER = struct.Struct('>8s8sBIQQQ')
+CHECKPOINT_MAGIC = b'BYXCKPT1'
+CHECKPOINT_SUFFIX = '.byxhash-checkpoint'
+
+DEFAULT_SAMPLE_BLOCKS = 16
+DEFAULT_SAMPLE_SIZE = 64 * 1024 # 16 x 64K, every fingerprint reads 1 MiB however large the file is
+SAMPLE_PREFIX = 'sample:' # Marks fingerprints in every output, including manifests, so they are never taken for content hashes
+SAMPLE_PERSON = b'byxhash-sample' # BLAKE2 personalisation, a fingerprint can never equal a plain blake2b digest of the same bytes
+SAMPLE_HEADER = struct.Struct('>QII') # File size, block count, block size
+
+DEFAULT_CDC_MIN = 2 * 1024 # '--cdc', FastCDC's usual 2K/8K/64K split, cuts land near the average while min and max bound the outliers
+DEFAULT_CDC_AVG = 8 * 1024
+DEFAULT_CDC_MAX = 64 * 1024
+GEAR_PERSON = b'byxhash-gear' # BLAKE2 personalisation the Gear table is derived from, fixed so cut points never change between builds
+GEAR_WINDOW = 64 # Bytes a 64-bit Gear fingerprint depends on, each byte is shifted out after 64 steps
+GEAR_MASK = (1 << 64) - 1
+CDC_SCAN_TILE = 64 * 1024 # Positions per vectorised cut point scan, small enough for its working arrays to stay in cache
+CDC_SLOW_NOTICE = 16 * 1024 * 1024 # Inputs past this point get a one-time note when the cut search runs without numpy
+
+MINHASH_SIZE = 128 # '--similarity', Signature values, each estimates Jaccard similarity to within about 1/sqrt(128)
+MINHASH_PERSON = b'byxhash-minhash' # Chunk features are hashed with their own personalisation, independent of -a
+MINHASH_DENSIFY_STEP = 0x9E3779B97F4A7C15 # Offset per bin of distance when an empty bin borrows a neighbour's value
+SIMILARITY_PREFIX = 'minhash:'
+LSH_BANDS = 32 # '--index', 32 bands of 4 rows, files at 0.5 similarity share a bucket 87% of the time, at 0.2 only 5%
+DEFAULT_SIMILARITY_THRESHOLD = 0.5
+
+SIMILARITY_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS signatures (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, signature BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS buckets (band INTEGER NOT NULL, bucket INTEGER NOT NULL, id INTEGER NOT NULL, PRIMARY KEY (band, bucket, id)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS buckets_id ON buckets (id);
+'''
+
+# '--serve', '--connect', Daemon wire protocol, all integers big-endian:
+#   request  = op (1 byte, 'D' payload is data, 'P' payload is a UTF-8 path), algorithm id (1 byte, index into
+#              REMOTE_ALGORITHMS), digest length (1 byte, 0 for the default), payload length (4 bytes), payload
+#   response = status (1 byte, 0 ok, 1 error), body length (4 bytes), body (raw digest, or UTF-8 error message)
+# Requests may be pipelined, responses always come back in request order.
+REQUEST_HEADER = struct.Struct('>BBBI')
+RESPONSE_HEADER = struct.Struct('>BI')
+REMOTE_ALGORITHMS = ['blake2b', 'blake2s', 'sha256']
+OP_DATA = ord('D')
+OP_PATH = ord('P')
+MAX_REMOTE_PAYLOAD = 256 * 1024 * 1024
+INLINE_PAYLOAD_LIMIT = 64 * 1024 # Smaller data payloads are hashed on the event loop, larger ones go to the thread pool
+
+DEFAULT_BENCH_SIZES = '64,4K,1M,64M'
+
+BENCH_LENGTHS = {'blake2b': [16, 32, 64], 'blake2s': [16, 32], 'sha256': [32]}
+
+BENCH_MIN_TIME = 0.25 # Seconds each case is repeated for, the best run is reported
+
+IO_MODES = ['default', 'nocache', 'direct']
+
+DEFAULT_READAHEAD = 3 # Buffers in the --readahead ring, one being read, one being hashed and one spare to absorb jitter
+
+DEFAULT_MMAP_THRESHOLD = 64 * 1024 * 1024 # Smaller files are read, mapping and faulting in a few chunks costs more than the copy it saves
+
+MMAP_WINDOW = 256 * 1024 * 1024 # Files are mapped this much at a time, keeping address space use flat for huge files on 32-bit builds
+
+COMPRESSION_MAGIC = {'gzip': b'\x1f\x8b', 'bz2': b'BZh', 'xz': b'\xfd7zXZ\x00'} # '--decompress auto', Leading bytes of each stdlib format
+
+DIRECT_ALIGNMENT = 4096 # O_DIRECT needs buffer address, length and file offset aligned to the logical block size, a page covers every common disk
+
+DEFAULT_WATCH_INTERVAL = 2.0 # '--watch', Seconds between full scans when polling
+
+DEFAULT_DEBOUNCE = 1.0 # '--watch', Files are hashed once they have gone this long without a write
+
+# '--watch', inotify(7) constants, every event the watcher acts on plus the flags it reads back
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+IN_DONT_FOLLOW = 0x2000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR | IN_DONT_FOLLOW
+INOTIFY_EVENT = struct.Struct('iIII') # wd, mask, cookie, name length, then the NUL padded name
+INOTIFY_READ_SIZE = 64 * 1024
+
+SIZE_SUFFIXES = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(value): # Parses byte sizes for argparse, accepts plain integers or K/M/G suffixes (e.g. 64K, 4M)
+    text = value.strip().upper().rstrip('B')
+    multiplier = 1
+    if text and text[-1] in SIZE_SUFFIXES:
+        multiplier = SIZE_SUFFIXES[text[-1]]
+        text = text[:-1]
+    try:
+        size = int(text) * multiplier
+    except ValueError:
+        raise ArgumentTypeError(f"invalid size: '{value}'")
+    if size < 1:
+        raise ArgumentTypeError(f"size must be at least 1 byte: '{value}'")
+    return size
+
+
+def parse_size_list(value): # '--bench-sizes', Comma separated sizes for argparse
+    return [parse_size(size) for size in value.split(',') if size.strip()]
+
+
+def parse_algorithms(value): # '-a', '--algorithm', Parses a comma separated algorithm list for argparse, keeping order and dropping repeats
+    algorithms = [name.strip().lower() for name in value.split(',') if name.strip()]
+    for name in algorithms:
+        if name not in MAX_DIGEST_SIZES:
+            raise ArgumentTypeError(f"invalid choice: '{name}' (choose from blake2b, blake2s, sha256)")
+    if not algorithms:
+        raise ArgumentTypeError("no algorithm given")
+    return list(dict.fromkeys(algorithms))
+
+
+def get_args():
+    parser = ArgumentParser(
+        description='CLI Tool for checking and manipulating inputs with blake2b',
+        epilog='Developed for Yuki, by Yuki, Always and Forever',
+        formatter_class=RawDescriptionHelpFormatter
+    )
+    group =(
+        parser.add_mutually_exclusive_group()
+    )
+    parser.usage =(
+        'Basic Usage: [INPUT] -l (Length), -a (Algorithm), -f (File), -s (Save), -v & -vv (Verbosity)'
+    )
+    parser.add_argument(
+        'input', type=str, nargs='?', help='Input to be hashed (Omit to read from stdin)'
+    )
+    parser.add_argument(
+        '-a', '--algorithm', type=parse_algorithms, default='blake2b', 
+        help='Hash algorithm to use: blake2b [Default], blake2s, or sha256, comma separated for several digests in one pass'
+    )
+    parser.add_argument(
+        '-l', '--length', type=int, default=None, 
+        help='Maximum hash length in bytes: blake2b (1-64), blake2s (1-32), sha256 (fixed at 32)'
+    )
+    parser.add_argument(
+        '-f', '--file', type=str, metavar='FILE',
+        help='Hash contents of specified file'
+    )
+    parser.add_argument(
+        '-s', '--save', type=str, metavar='FILE',
+        help='Save hash output to specified file'
+    )
+    parser.add_argument(
+        '-c', '--compare', type=str, metavar='HASH',
+        help='Compare computed hash against provided hash value'
+    )
+    parser.add_argument(
+        '--buffer-size', type=parse_size, default=DEFAULT_BUFFER_SIZE, metavar='SIZE',
+        help='Read buffer size for file and stdin input, accepts K/M/G suffixes (default: 1M)'
+    )
+    parser.add_argument(
+        '--io', type=str, default='default', choices=IO_MODES,
+        help='File read mode: default, nocache (drop pages behind the cursor) or direct (O_DIRECT, falls back to nocache)'
+    )
+    parser.add_argument(
+        '--mmap', action='store_true',
+        help='Hash regular files through a read-only memory map whatever their size (pipes, procfs, empty files and --watch inputs are still read)'
+    )
+    parser.add_argument(
+        '--mmap-threshold', type=parse_size, default=DEFAULT_MMAP_THRESHOLD, metavar='SIZE',
+        help='-f FILE inputs at least this large are memory mapped automatically with --io default, '
+             '-r, --check and --find-duplicates only map files with --mmap (default: 64M)'
+    )
+    parser.add_argument(
+        '--no-mmap', action='store_true',
+        help='Always read files, never memory map them'
+    )
+    parser.add_argument(
+        '--sparse', action='store_true',
+        help='Skip holes in sparse files with SEEK_DATA/SEEK_HOLE, hashing them as zeros without reading (same digest)'
+    )
+    parser.add_argument(
+        '--readahead', type=int, nargs='?', const=DEFAULT_READAHEAD, default=0, metavar='N',
+        help=f'Read file and stdin input on a separate thread into a ring of N buffers, overlapping I/O with hashing (default: off, {DEFAULT_READAHEAD} if N is omitted)'
+    )
+    parser.add_argument(
+        '--decompress', type=str, nargs='?', const='auto', choices=['auto'] + list(COMPRESSION_MAGIC), metavar='FORMAT',
+        help='Hash the decompressed content of a gzip, bz2 or xz file or stdin, decompressing on a separate thread (FORMAT: auto [Default], gzip, bz2, xz)'
+    )
+    parser.add_argument(
+        '--lines', action='store_true',
+        help='Record mode: hash every newline delimited record of the input, one digest per line'
+    )
+    parser.add_argument(
+        '-z', '--null-data', action='store_true',
+        help='Record mode with NUL delimited records and NUL terminated output'
+    )
+    parser.add_argument(
+        '--encoding', type=str, default='hex', choices=['hex', 'base64', 'raw'],
+        help='Digest encoding for record mode: hex [Default], base64, or raw (fixed size, no separators)'
+    )
+    parser.add_argument(
+        '--tee', action='store_true',
+        help='Passthrough mode: copy the input to stdout (or -s FILE) while hashing it, digest goes to stderr'
+    )
+    parser.add_argument(
+        '--digest-file', type=str, metavar='FILE',
+        help='Write the --tee digest to a sidecar file instead of stderr'
+    )
+    parser.add_argument(
+        '--serve', type=str, metavar='SOCKET',
+        help='Run as a hashing daemon listening on a Unix socket'
+    )
+    parser.add_argument(
+        '--connect', type=str, metavar='SOCKET',
+        help='Hash through a running --serve daemon instead of in this process, stdin longer than --buffer-size is hashed locally'
+    )
+    parser.add_argument(
+        '--tree', action='store_true',
+        help='BLAKE2 tree mode for -f: hash fixed-size leaves across -j threads and combine them into a root digest'
+    )
+    parser.add_argument(
+        '--leaf-size', type=parse_size, default=DEFAULT_LEAF_SIZE, metavar='SIZE',
+        help='Leaf size for --tree, part of the digest so verifiers must use the same value (default: 4M)'
+    )
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help='--tree for append-only files: keep leaf digests in a checkpoint sidecar and only hash bytes appended since the last run, '
+             'the first and last checkpointed leaves are re-verified but edits between them are not detected, use --tree for files rewritten in place'
+    )
+    parser.add_argument(
+        '--checkpoint', type=str, metavar='FILE',
+        help=f'Checkpoint file for --incremental (default: FILE{CHECKPOINT_SUFFIX})'
+    )
+    parser.add_argument(
+        '--sample', action='store_true',
+        help='Fast change-detection fingerprint of -f, -r or --check files: size plus head, tail and evenly spaced blocks (not a content hash)'
+    )
+    parser.add_argument(
+        '--sample-blocks', type=int, default=DEFAULT_SAMPLE_BLOCKS, metavar='N',
+        help=f'Blocks read per --sample fingerprint, at least 2 for head and tail (default: {DEFAULT_SAMPLE_BLOCKS})'
+    )
+    parser.add_argument(
+        '--sample-size', type=parse_size, default=DEFAULT_SAMPLE_SIZE, metavar='SIZE',
+        help='Size of each --sample block (default: 64K)'
+    )
+    parser.add_argument(
+        '--cdc', action='store_true',
+        help='Content-defined chunking: split the input with a Gear rolling hash (FastCDC) and list offset, length and digest per chunk, then the whole input digest '
+             '(installing numpy vectorises the cut search, about 20x faster than the pure-Python fallback)'
+    )
+    parser.add_argument(
+        '--cdc-min', type=parse_size, default=DEFAULT_CDC_MIN, metavar='SIZE',
+        help='Smallest --cdc chunk, except the last one (default: 2K)'
+    )
+    parser.add_argument(
+        '--cdc-avg', type=parse_size, default=DEFAULT_CDC_AVG, metavar='SIZE',
+        help='Target average --cdc chunk size, a power of two (default: 8K)'
+    )
+    parser.add_argument(
+        '--cdc-max', type=parse_size, default=DEFAULT_CDC_MAX, metavar='SIZE',
+        help='Largest --cdc chunk, a cut is forced here (default: 64K)'
+    )
+    parser.add_argument(
+        '--similarity', action='store_true',
+        help='Similarity signature instead of a digest: MinHash over the --cdc chunks of the input, or of every file with -r'
+    )
+    parser.add_argument(
+        '--index', type=str, metavar='FILE',
+        help='LSH index database that --similarity adds signatures to and --similar searches'
+    )
+    parser.add_argument(
+        '--similar', type=str, metavar='FILE',
+        help='List files in --index whose estimated similarity to FILE reaches --threshold, most similar first'
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=DEFAULT_SIMILARITY_THRESHOLD, metavar='RATIO',
+        help=f'Minimum estimated Jaccard similarity for --similar (default: {DEFAULT_SIMILARITY_THRESHOLD})'
+    )
+    parser.add_argument(
+        '-r', '--recursive', type=str, metavar='DIR',
+        help='Hash every file under DIR and write a sha256sum/b2sum compatible manifest (to stdout or -s FILE)'
+    )
+    parser.add_argument(
+        '--archive', type=str, metavar='FILE',
+        help='Hash every member of a zip or tar (optionally gz/bz2/xz) archive without extracting it, b2sum style manifest keyed by member path (- reads a tar from stdin)'
+    )
+    parser.add_argument(
+        '--find-duplicates', type=str, nargs='+', metavar='DIR',
+        help='Report groups of identical files under one or more directories, narrowing by size, then head and tail, then full digest'
+    )
+    parser.add_argument(
+        '--hardlinks', action='store_true',
+        help='With --find-duplicates, read hardlinked paths once and list them with their copies'
+    )
+    parser.add_argument(
+        '--format', type=str, default='text', choices=['text', 'json'],
+        help='Output format for --find-duplicates, --cdc, --archive and --similar: text [Default] (b2sum lines, blank line between groups for duplicates) or json (one record per line)'
+    )
+    parser.add_argument(
+        '--watch', type=str, metavar='DIR',
+        help='Keep a live manifest of DIR: hash every file, then stream JSON lines as files are added, modified or removed until interrupted'
+    )
+    parser.add_argument(
+        '--watch-interval', type=float, default=DEFAULT_WATCH_INTERVAL, metavar='SECONDS',
+        help=f'Seconds between scans when --watch polls (default: {DEFAULT_WATCH_INTERVAL})'
+    )
+    parser.add_argument(
+        '--debounce', type=float, default=DEFAULT_DEBOUNCE, metavar='SECONDS',
+        help=f'--watch waits until a file has not been written for this long before hashing it (default: {DEFAULT_DEBOUNCE})'
+    )
+    parser.add_argument(
+        '--poll', action='store_true',
+        help='Make --watch poll with os.scandir even where inotify is available'
+    )
+    parser.add_argument(
+        '--check', type=str, metavar='MANIFEST',
+        help='Verify every file listed in a sha256sum/b2sum style manifest (use - for stdin)'
+    )
+    parser.add_argument(
+        '--fail-fast', action='store_true',
+        help='Stop --check at the first FAILED or MISSING file'
+    )
+    parser.add_argument(
+        '--cache', type=str, metavar='FILE', default=None,
+        help='Digest cache database for file inputs (default: $XDG_CACHE_HOME/byxhash/cache.sqlite3)'
+    )
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='Neither read nor write the digest cache'
+    )
+    parser.add_argument(
+        '--refresh', action='store_true',
+        help='Ignore cached digests and rehash every file, updating the cache'
+    )
+    parser.add_argument(
+        '--trust-cache', action='store_true',
+        help='Let --check and -c accept cached digests of unchanged files instead of rereading them (faster, but bit rot goes unnoticed)'
+    )
+    parser.add_argument(
+        '--cache-size', type=int, default=DEFAULT_CACHE_ENTRIES, metavar='N',
+        help=f'Maximum cache entries before least recently used ones are evicted (default: {DEFAULT_CACHE_ENTRIES})'
+    )
+    parser.add_argument(
+        '--bench', action='store_true',
+        help='Benchmark algorithms, digest lengths, input sizes and read strategies, JSON results to stdout or -s FILE'
+    )
+    parser.add_argument(
+        '--bench-sizes', type=parse_size_list, default=DEFAULT_BENCH_SIZES, metavar='SIZES',
+        help=f'Comma separated input sizes for --bench (default: {DEFAULT_BENCH_SIZES})'
+    )
+    parser.add_argument(
+        '--bench-dir', type=str, metavar='DIR',
+        help='Directory for --bench input files, pick one on the disk under test (default: system temp)'
+    )
+    parser.add_argument(
+        '--bench-baseline', type=str, metavar='FILE',
+        help='Compare --bench results against a saved JSON run, exit 1 on regressions'
+    )
+    parser.add_argument(
+        '--bench-tolerance', type=float, default=0.10, metavar='RATIO',
+        help='Allowed throughput drop against --bench-baseline before it counts as a regression (default: 0.10)'
+    )
+    parser.add_argument(
+        '--lookup', type=str, metavar='HASH',
+        help='List cached paths whose digest matches HASH'
+    )
+    parser.add_argument(
+        '--stats', type=str, nargs='?', const='text', choices=['text', 'json'],
+        help='Report bytes read, read vs hash time and other counters on stderr, as text [Default] or json'
+    )
+    parser.add_argument(
+        '-j', '--workers', type=int, default=os.cpu_count() or 1, metavar='N',
+        help='Number of parallel hashing workers for directory and manifest modes (default: CPU count)'
+    )
+    parser.add_argument(
+        '--pool', type=str, default='thread', choices=['thread', 'process'],
+        help='Worker pool type for directory and manifest modes: thread [Default] or process'
+    )
+    group.add_argument(
+        '-q', '--quiet', action='store_true',
+        help='Quiet mode, only output the hash'
+    )
+    group.add_argument(
+        '-v', '--verbose', action='count', default=0,
+        help='Add Verbosity (-v for verbose, -vv for full verbose)'
+    )
+    args = parser.parse_args()
+    args.algorithms, args.algorithm = args.algorithm, args.algorithm[0] # Directory and manifest modes use the first, single inputs use them all
+    args.tree = args.tree or args.incremental # '--incremental', Produces the --tree digest, so every --tree rule applies
+    args.mmap_threshold = None if args.no_mmap else 1 if args.mmap else args.mmap_threshold # '--mmap', Any non-empty file
+    return args
+
+
+@lru_cache(maxsize=None)
+def get_hash_function(algorithm, length=None): # '-a', '--algorithm', Returns a constructor for the appropriate hash object with specified digest length if applicable, raises ValueError otherwise.
+    if algorithm == 'blake2b':
+        digest_size = length if length else 64
+        if digest_size < 1 or digest_size > 64:
+            raise ValueError("blake2b hash length must be between 1 and 64 bytes")
+        return partial(blake2b, digest_size=digest_size)
+    
+    elif algorithm == 'blake2s':
+        digest_size = length if length else 32
+        if digest_size < 1 or digest_size > 32:
+            raise ValueError("blake2s hash length must be between 1 and 32 bytes")
+        return partial(blake2s, digest_size=digest_size)
+    
+    elif algorithm == 'sha256':
+        if length and length != 32:
+            raise ValueError("sha256 has fixed length of 32 bytes")
+        return sha256
+    
+    else:
+        raise ValueError(f"Unknown algorithm '{algorithm}'")
+
+
+def algorithm_length(algorithm, length): # '-l', '--length', sha256 has a fixed size, so -l only applies to the blake2 algorithms
+    return None if algorithm == 'sha256' else length
+
+
+class Hasher: # Streaming hash object for library use, update/digest/hexdigest are the hashlib object's own bound methods
+    __slots__ = ('algorithm', 'state', 'update', 'digest', 'hexdigest')
+
+    def __init__(self, algorithm='blake2b', length=None, data=None):
+        self.bind(algorithm, get_hash_function(algorithm, length)())
+        if data is not None:
+            self.update(data)
+
+    def bind(self, algorithm, state):
+        self.algorithm = algorithm
+        self.state = state
+        self.update = state.update
+        self.digest = state.digest
+        self.hexdigest = state.hexdigest
+
+    @property
+    def digest_size(self):
+        return self.state.digest_size
+
+    def copy(self): # Independent clone of the current state, e.g. to digest a common prefix once
+        clone = Hasher.__new__(Hasher)
+        clone.bind(self.algorithm, self.state.copy())
+        return clone
+
+
+def hash_stream(fileobj, algorithm='blake2b', length=None, buffer_size=DEFAULT_BUFFER_SIZE): # Library entry point, hashes a binary file object to EOF and returns the hex digest
+    hasher = get_hash_function(algorithm, length)()
+    hash_chunks(iter_chunks(fileobj, buffer_size), [hasher])
+    return hasher.hexdigest()
+
+
+def hash_file(path, algorithm='blake2b', length=None, buffer_size=DEFAULT_BUFFER_SIZE): # Library entry point, hashes a file by path and returns the hex digest
+    return digest_file(path, get_hash_function(algorithm, length), buffer_size)
+
+
+def hash_many(paths, algorithm='blake2b', length=None, workers=None, buffer_size=DEFAULT_BUFFER_SIZE): # Library entry point, yields (path, hex digest) in input order, hashed on a thread pool
+    from concurrent.futures import ThreadPoolExecutor
+    worker = partial(digest_file, hash_func=get_hash_function(algorithm, length), buffer_size=buffer_size)
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path, future in ordered_map(executor, worker, paths, workers * 4):
+            yield path, future.result()
+
+
+def get_input_data(args): # 'input', Opens a binary stream over the file, stdin, or command line argument
+    if args.file: # '-f', '--file', File input, unbuffered so readinto lands directly in our buffer
+        try:
+            return open_input_file(args.file, args.io), f'file: {args.file}'
+        except IOError as e:
+            print(f"Error reading file: {e}")
+            sys.exit(1)
+    
+    elif args.input is None: # stdin input, read as raw bytes so binary data is hashed untouched
+        if sys.stdin.isatty():
+            print("Error: No input provided. Use [INPUT], -f FILE, or pipe data via stdin")
+            sys.exit(1)
+        return sys.stdin.buffer, 'stdin'
+    
+    else: # CLI Argument
+        return io.BytesIO(args.input.encode()), f"string: '{args.input}'"
+
+
+read_buffers = threading.local()
+
+
+def get_read_buffer(buffer_size): # One buffer per thread reused across calls, so hashing many inputs allocates nothing per input
+    view = getattr(read_buffers, 'view', None)
+    if view is None or len(view) < buffer_size:
+        view = memoryview(bytearray(buffer_size))
+        read_buffers.view = view
+    return view[:buffer_size]
+
+
+def iter_chunks(stream, buffer_size=DEFAULT_BUFFER_SIZE, buffers=None): # Yields memoryview slices of the thread's read buffer filled via readinto, one active reader per thread
+    readinto = getattr(stream, 'readinto', None)
+    if readinto is None: # Plain read() streams still work, at the cost of a fresh bytes object per chunk
+        yield from iter(partial(stream.read, buffer_size), b'')
+        return
+    buffers = buffers or repeat(get_read_buffer(buffer_size)) # '--readahead' passes its ring instead
+    while True:
+        view = next(buffers)
+        count = readinto(view)
+        if not count:
+            break
+        yield view[:count]
+
+
+def aligned_size(buffer_size): # '--io direct', Rounds a read size up to whole DIRECT_ALIGNMENT blocks
+    return -(-buffer_size // DIRECT_ALIGNMENT) * DIRECT_ALIGNMENT
+
+
+def aligned_buffer(buffer_size): # Page aligned buffer from an anonymous mmap, rounded up to whole blocks
+    import mmap
+    return memoryview(mmap.mmap(-1, aligned_size(buffer_size)))
+
+
+def get_direct_buffer(buffer_size): # '--io direct', O_DIRECT needs aligned memory, reused per thread like get_read_buffer
+    view = getattr(read_buffers, 'direct_view', None)
+    if view is None or len(view) < buffer_size:
+        view = aligned_buffer(buffer_size)
+        read_buffers.direct_view = view
+    return view[:aligned_size(buffer_size)]
+
+
+def direct_opener(path, flags): # '--io direct', opener for open() adding O_DIRECT
+    return os.open(path, flags | os.O_DIRECT)
+
+
+def open_input_file(path, io_mode='default'): # Unbuffered binary file, opened with O_DIRECT for '--io direct' unless the platform or filesystem refuses it
+    if io_mode == 'direct' and hasattr(os, 'O_DIRECT'):
+        try:
+            return open(path, 'rb', buffering=0, opener=direct_opener)
+        except OSError as e:
+            if e.errno != errno.EINVAL: # e.g. tmpfs, read on through the page cache instead
+                raise
+    return open(path, 'rb', buffering=0)
+
+
+def fadvise(fd, offset, length, advice): # '--io', posix_fadvise that reports False when the kernel refuses the hint instead of failing the read
+    try:
+        os.posix_fadvise(fd, offset, length, advice)
+    except OSError:
+        return False
+    return True
+
+
+def is_direct(fd): # '--io direct', Whether the descriptor actually carries O_DIRECT
+    if not hasattr(os, 'O_DIRECT'):
+        return False
+    import fcntl
+    return bool(fcntl.fcntl(fd, fcntl.F_GETFL) & os.O_DIRECT)
+
+
+def clear_direct(fd): # '--io direct', Drops O_DIRECT from an open descriptor, for filesystems that accept the open but refuse the reads
+    import fcntl
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) & ~os.O_DIRECT)
+
+
+def iter_uncached_chunks(stream, buffer_size=DEFAULT_BUFFER_SIZE, buffers=None): # '--io nocache', '--io direct', Sequential read-ahead, pages behind the cursor are dropped so bulk scans leave other services' cache alone
+    fd = stream.fileno()
+    direct = is_direct(fd)
+    drop = hasattr(os, 'posix_fadvise') and fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL) # Missing on macOS, reads still work without the hints
+    buffers = buffers or repeat(get_direct_buffer(buffer_size) if direct else get_read_buffer(buffer_size))
+    offset = os.lseek(fd, 0, os.SEEK_CUR)
+    while True:
+        view = next(buffers)
+        try:
+            count = stream.readinto(view)
+        except OSError as e:
+            if not direct or e.errno != errno.EINVAL:
+                raise
+            clear_direct(fd) # Nothing was read, so the offset is unchanged and the same buffer is filled through the cache
+            direct = False
+            count = stream.readinto(view)
+        if not count:
+            break
+        if drop and not direct: # O_DIRECT reads never populate the cache, so there is nothing to drop
+            fadvise(fd, offset, count, os.POSIX_FADV_DONTNEED)
+        offset += count
+        yield view[:count]
+
+
+def iter_mmap_chunks(stream, buffer_size=DEFAULT_BUFFER_SIZE, window=MMAP_WINDOW): # '--mmap', Maps the file read-only window by window and yields slices of the mapping, nothing is copied into user space
+    import mmap
+    fd = stream.fileno()
+    size = os.fstat(fd).st_size
+    offset = stream.tell()
+    while offset < size:
+        base = offset - offset % mmap.ALLOCATIONGRANULARITY
+        length = min(window, size - base)
+        try:
+            mapped = mmap.mmap(fd, length, access=mmap.ACCESS_READ, offset=base)
+        except (OSError, ValueError): # Filesystems without mmap support, the rest is read normally
+            break
+        if hasattr(mapped, 'madvise'): # Python 3.8+, doubles the kernel's read-ahead for the window
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        view = memoryview(mapped)
+        for start in range(offset - base, length, buffer_size):
+            yield view[start:start + buffer_size]
+        offset = base + length
+        del view, mapped # Unmapped once the caller drops the last slice, closing here would fail while it still holds one
+    stream.seek(offset) # Anything appended since the size was taken, or the whole file if mapping failed
+    yield from iter_chunks(stream, buffer_size)
+
+
+@lru_cache(maxsize=None)
+def get_zero_buffer(buffer_size): # '--sparse', Read-only zeros shared by every thread, holes are hashed from here instead of read
+    return memoryview(bytes(buffer_size))
+
+
+def iter_sparse_chunks(stream, buffer_size=DEFAULT_BUFFER_SIZE, extents=None): # '--sparse', Reads only the data extents, holes come from the zero buffer so the digest matches a full read
+    fd = stream.fileno()
+    size = os.fstat(fd).st_size
+    offset = stream.tell()
+    extents = {} if extents is None else extents
+    extents.setdefault('data', 0)
+    extents.setdefault('hole', 0)
+    zeros = get_zero_buffer(buffer_size)
+    view = get_read_buffer(buffer_size)
+    while offset < size:
+        try:
+            data = os.lseek(fd, offset, os.SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO: # No data past offset, the rest of the file is a hole
+                data = size
+            elif e.errno in (errno.EINVAL, errno.EOPNOTSUPP): # Filesystem without hole support
+                break
+            else:
+                raise
+        data = min(data, size)
+        extents['hole'] += data - offset
+        while offset < data:
+            count = min(buffer_size, data - offset)
+            yield zeros[:count]
+            offset += count
+        if offset >= size:
+            break
+        end = min(os.lseek(fd, offset, os.SEEK_HOLE), size)
+        stream.seek(offset)
+        while offset < end:
+            count = stream.readinto(view[:min(buffer_size, end - offset)])
+            if not count: # Truncated while hashing
+                size = offset
+                break
+            extents['data'] += count
+            offset += count
+            yield view[:count]
+    stream.seek(offset) # Anything appended since the size was taken, or the whole file without hole support
+    for chunk in iter_chunks(stream, buffer_size):
+        extents['data'] += len(chunk)
+        yield chunk
+
+
+def use_mmap(stream, mmap_threshold): # '--mmap', Only non-empty regular files at or above the threshold, pipes and procfs (size 0) are read
+    if not mmap_threshold or not isinstance(stream, io.FileIO):
+        return False
+    info = os.fstat(stream.fileno())
+    return stat.S_ISREG(info.st_mode) and info.st_size >= max(1, mmap_threshold)
+
+
+def iter_file_chunks(stream, buffer_size=DEFAULT_BUFFER_SIZE, io_mode='default', buffers=None, mmap_threshold=None, sparse=False, extents=None): # '--io', '--mmap', '--sparse', Picks the chunk reader, only regular files take the hole skipping, page cache friendly or mapped paths
+    if sparse and buffers is None and hasattr(os, 'SEEK_DATA') and isinstance(stream, io.FileIO) and stat.S_ISREG(os.fstat(stream.fileno()).st_mode):
+        return iter_sparse_chunks(stream, buffer_size, extents)
+    if io_mode == 'default' and buffers is None and use_mmap(stream, mmap_threshold):
+        return iter_mmap_chunks(stream, buffer_size)
+    if io_mode == 'default' or not isinstance(stream, io.FileIO) or not stat.S_ISREG(os.fstat(stream.fileno()).st_mode):
+        return iter_chunks(stream, buffer_size, buffers)
+    return iter_uncached_chunks(stream, buffer_size, buffers)
+
+
+def iter_readahead_chunks(stream, buffer_size=DEFAULT_BUFFER_SIZE, io_mode='default', depth=DEFAULT_READAHEAD): # '--readahead', A reader thread fills a ring of preallocated buffers while the caller hashes, chunks are handed over without copying
+    import queue
+    size = aligned_size(buffer_size) if io_mode == 'direct' else buffer_size
+    ring = [aligned_buffer(size)[:size] for _ in range(max(1, depth))] # Aligned so '--io direct' can read into them too
+    free = queue.SimpleQueue()
+    filled = queue.SimpleQueue() # Bounded by the ring, the reader blocks on 'free' once every buffer is waiting to be hashed
+    for view in ring:
+        free.put(view)
+
+    def take_buffers():
+        while True:
+            view = free.get()
+            if view is None: # Caller stopped early
+                return
+            yield view
+
+    def reader():
+        try:
+            for chunk in iter_file_chunks(stream, buffer_size, io_mode, take_buffers()):
+                filled.put(chunk)
+            filled.put(None)
+        except BaseException as e: # Raised again on the hashing side, RuntimeError here just means the caller stopped early
+            filled.put(e)
+
+    thread = threading.Thread(target=reader, name='byxhash-readahead', daemon=True)
+    thread.start()
+    index = 0
+    try:
+        while True:
+            chunk = filled.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, BaseException):
+                raise chunk
+            yield chunk
+            free.put(ring[index % len(ring)]) # Buffers are filled and hashed in the same order, so the oldest one is the one just finished
+            index += 1
+    finally:
+        free.put(None) # Unblocks a reader still waiting for a buffer, one stuck in a read exits with the process as a daemon thread
+
+
+def open_decompressed(stream, compression, buffer_size=DEFAULT_BUFFER_SIZE): # '--decompress', Wraps a raw input stream in the stdlib decompressor, returns (stream, format), ValueError if 'auto' finds no known format
+    import bz2
+    import gzip
+    import lzma
+    if not hasattr(stream, 'peek'): # Buffered, the decompressors ask for small reads and 'auto' needs to look ahead
+        stream = io.BufferedReader(stream, buffer_size)
+    if compression == 'auto':
+        head = stream.peek(max(map(len, COMPRESSION_MAGIC.values())))
+        compression = next((name for name, magic in COMPRESSION_MAGIC.items() if head.startswith(magic)), None)
+        if compression is None:
+            raise ValueError("input is not gzip, bz2 or xz compressed")
+    openers = {
+        'gzip': lambda raw: gzip.GzipFile(fileobj=raw, mode='rb'),
+        'bz2': bz2.BZ2File,
+        'xz': lzma.LZMAFile, # Also reads legacy .lzma
+    }
+    return openers[compression](stream), compression
+
+
+def iter_decompressed_chunks(stream, args): # '--decompress', The --readahead thread runs the decompressor, zlib, bz2 and lzma release the GIL so it overlaps with hashing
+    import lzma
+    try:
+        yield from iter_readahead_chunks(stream, args.buffer_size, 'default', args.readahead or DEFAULT_READAHEAD)
+    except (EOFError, lzma.LZMAError) as e: # Truncated or corrupt data, surfaced like any other read error
+        raise IOError(f"invalid {args.decompress} data: {e}") from e
+
+
+def iter_input_chunks(stream, args, extents=None): # '--io', '--readahead', '--sparse', '--decompress', Chunk reader for the single input paths, -f, stdin and --tee
+    if args.decompress: # Never mapped or hole-skipped, those would see the compressed file
+        return iter_decompressed_chunks(stream, args)
+    if args.readahead > 0 and hasattr(stream, 'readinto') and not args.sparse:
+        return iter_readahead_chunks(stream, args.buffer_size, args.io, args.readahead)
+    return iter_file_chunks(stream, args.buffer_size, args.io, mmap_threshold=args.mmap_threshold, sparse=args.sparse, extents=extents)
+
+
+def hash_chunks(chunks, hashers, executor=None, head_size=100): # Feeds each chunk into every hash object, returns total length and leading bytes for '-vv' output
+    length = 0
+    head = b''
+    first_update = hashers[0].update
+    other_updates = [hasher.update for hasher in hashers[1:]]
+    for chunk in chunks:
+        if len(head) < head_size:
+            head += bytes(chunk[:head_size - len(head)])
+        if executor: # hashlib releases the GIL on large updates, so extra hashers run alongside the first
+            pending = [executor.submit(update, chunk) for update in other_updates]
+            first_update(chunk)
+            for future in pending:
+                future.result()
+        else:
+            first_update(chunk)
+            for update in other_updates:
+                update(chunk)
+        length += len(chunk)
+    return length, head
+
+
+def get_hasher_executor(hashers, args): # '-a', Threads for the extra hashers of a multi-algorithm pass, nothing to start for a single one
+    if len(hashers) > 1 and args.workers > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        return ThreadPoolExecutor(max_workers=len(hashers) - 1)
+    from contextlib import nullcontext
+    return nullcontext()
+
+
+def iter_record_batches(stream, delimiter, buffer_size=DEFAULT_BUFFER_SIZE): # '--lines', '-z', Yields lists of records split on delimiter, memory bounded by buffer and longest record
+    read = getattr(stream, 'read1', stream.read) # read1 returns what is available instead of waiting for a full buffer
+    remainder = b''
+    while True:
+        block = read(buffer_size)
+        if not block:
+            break
+        records = block.split(delimiter)
+        if remainder:
+            records[0] = remainder + records[0]
+        remainder = records.pop()
+        if records:
+            yield records
+    if remainder:
+        yield [remainder]
+
+
+def hash_records(stream, hash_func, args, client=None, stats=None): # '--lines', '-z', Streams one digest per record through a large buffered writer, returns the exit code
+    delimiter = b'\0' if args.null_data else b'\n'
+    try:
+        output =(
+            open(args.save, 'wb', buffering=args.buffer_size) if args.save
+            else open(sys.stdout.fileno(), 'wb', buffering=args.buffer_size, closefd=False)
+        )
+    except IOError as e:
+        print(f"Error saving to file: {e}")
+        return 1
+
+    write = output.write
+    batches = iter_record_batches(stream, delimiter, args.buffer_size)
+    if stats: # '--stats', Encoding and writing are charged to the hash stage, output bytes are counted as they are written
+        batches = stats.timed_iter(batches, 'read', 'hash and write', 'records')
+        write = partial(counted_write, write, stats)
+    with output:
+        for records in batches:
+            if client: # '--connect', One pipelined round trip per input block
+                digests = client.request([(OP_DATA, args.algorithm, args.length, record) for record in records])
+            else:
+                digests = [hash_func(record).digest() for record in records]
+            if args.encoding == 'raw':
+                write(b''.join(digests))
+                continue
+            if args.encoding == 'hex':
+                encoded = [hexlify(digest) for digest in digests]
+            else:
+                encoded = [b2a_base64(digest, newline=False) for digest in digests]
+            write(delimiter.join(encoded))
+            write(delimiter)
+    return 0
+
+
+def counted_write(write, stats, data): # '--stats', Binary writer wrapper for modes that bypass print()
+    stats.count('output bytes', len(data))
+    return write(data)
+
+
+def abort_output(output, error): # Reports a failed manifest write once, a closed pipe silently, and points the stream at /dev/null so bytes still buffered cannot fail again at exit
+    if error.errno != errno.EPIPE:
+        print(f"Error saving to file: {error}", file=sys.stderr)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, output.fileno())
+    os.close(devnull)
+
+
+def resolve_remote_hash(algorithm_id, length, hash_funcs): # '--serve', Validates a request's algorithm and length, memoised per pair
+    key = algorithm_id, length
+    if key not in hash_funcs:
+        if algorithm_id >= len(REMOTE_ALGORITHMS):
+            raise ValueError(f"unknown algorithm id {algorithm_id}")
+        hash_funcs[key] = get_hash_function(REMOTE_ALGORITHMS[algorithm_id], length or None)
+    return hash_funcs[key]
+
+
+def answer_request(op, hash_func, payload, buffer_size): # '--serve', Hashes one request, returns (status, body) so errors travel back to the client
+    try:
+        if op == OP_DATA:
+            return 0, hash_func(payload).digest()
+        if op == OP_PATH:
+            return 0, bytes.fromhex(digest_file(os.fsdecode(payload), hash_func, buffer_size))
+        return 1, f"unknown op {op}".encode()
+    except (OSError, ValueError) as e:
+        return 1, str(e).encode()
+
+
+async def send_responses(responses, writer): # '--serve', Writes results in request order, draining only once caught up so small responses go out in batches
+    while True:
+        future = await responses.get()
+        if future is None:
+            break
+        status, body = await future
+        writer.write(RESPONSE_HEADER.pack(status, len(body)) + body)
+        if responses.empty():
+            await writer.drain()
+
+
+async def serve_connection(reader, writer, pool, hash_funcs, args): # '--serve', Reads pipelined requests, small ones inline and large ones on the pool
+    import asyncio
+    loop = asyncio.get_running_loop()
+    responses = asyncio.Queue()
+    sender = asyncio.create_task(send_responses(responses, writer))
+    try:
+        while True:
+            op, algorithm_id, length, size = REQUEST_HEADER.unpack(await reader.readexactly(REQUEST_HEADER.size))
+            if size > MAX_REMOTE_PAYLOAD: # The stream cannot be resynchronised, answer and hang up
+                result = loop.create_future()
+                result.set_result((1, f"payload larger than {MAX_REMOTE_PAYLOAD} bytes".encode()))
+                responses.put_nowait(result)
+                break
+            payload = await reader.readexactly(size)
+            try:
+                hash_func = resolve_remote_hash(algorithm_id, length, hash_funcs)
+            except ValueError as e:
+                result = loop.create_future()
+                result.set_result((1, str(e).encode()))
+            else:
+                if op == OP_DATA and size <= INLINE_PAYLOAD_LIMIT:
+                    result = loop.create_future()
+                    result.set_result(answer_request(op, hash_func, payload, args.buffer_size))
+                else:
+                    result = loop.run_in_executor(pool, answer_request, op, hash_func, payload, args.buffer_size)
+            responses.put_nowait(result)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        responses.put_nowait(None)
+        try:
+            await sender
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+async def run_daemon(path, args): # '--serve', asyncio front end with a thread pool for large payloads and file paths, stops on SIGINT/SIGTERM
+    import asyncio
+    import signal
+    from concurrent.futures import ThreadPoolExecutor
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    hash_funcs = {}
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        server = await asyncio.start_unix_server(
+            lambda reader, writer: serve_connection(reader, writer, pool, hash_funcs, args), path
+        )
+        if args.verbose >= 1:
+            print(f"Listening on {path} with {max(1, args.workers)} workers", file=sys.stderr)
+        async with server:
+            await stop.wait()
+
+
+def serve(path, args): # '--serve', Runs the daemon until interrupted, returns the exit code
+    import asyncio
+    import socket
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode): # Only a socket nobody listens on is stale, a live daemon keeps its clients
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+        except OSError as e:
+            print(f"Error starting daemon: {e}")
+            return 1
+        else:
+            print(f"Error: a daemon is already running on {path}")
+            return 1
+        finally:
+            probe.close()
+    try:
+        asyncio.run(run_daemon(path, args))
+    except OSError as e:
+        print(f"Error starting daemon: {e}")
+        return 1
+    finally:
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    return 0
+
+
+class DaemonClient: # '--connect', Thin blocking client for the '--serve' protocol, each call pipelines all of its requests
+    def __init__(self, path):
+        import socket
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.responses = self.sock.makefile('rb')
+
+    def request(self, requests): # requests are (op, algorithm, length, payload), returns raw digests in the same order
+        frames = []
+        for op, algorithm, length, payload in requests:
+            frames.append(REQUEST_HEADER.pack(op, REMOTE_ALGORITHMS.index(algorithm), algorithm_length(algorithm, length) or 0, len(payload)))
+            frames.append(payload)
+        self.sock.sendall(b''.join(frames))
+        digests = []
+        for _ in requests:
+            header = self.responses.read(RESPONSE_HEADER.size)
+            if len(header) < RESPONSE_HEADER.size:
+                raise IOError("daemon closed the connection")
+            status, size = RESPONSE_HEADER.unpack(header)
+            body = self.responses.read(size)
+            if status:
+                raise IOError(f"daemon: {body.decode(errors='replace')}")
+            digests.append(body)
+        return digests
+
+    def close(self):
+        self.responses.close()
+        self.sock.close()
+
+
+def remote_input(client, stream, args, hashers): # '--connect', Hashes the single input through the daemon, files are sent by path and read server side
+    if args.file:
+        payload, op = os.fsencode(os.path.abspath(args.file)), OP_PATH
+        input_length, input_head = os.fstat(stream.fileno()).st_size, b''
+    else: # stdin goes inline only if it fits in one buffer, anything longer is streamed through the local hashers instead of held in memory
+        limit = min(args.buffer_size, MAX_REMOTE_PAYLOAD)
+        parts = []
+        received = 0
+        while received <= limit:
+            part = stream.read(limit + 1 - received)
+            if not part:
+                break
+            parts.append(part)
+            received += len(part)
+        payload, op = b''.join(parts), OP_DATA
+        if received > limit:
+            if args.verbose >= 1:
+                print(f"byxhash: stdin is larger than {limit} bytes, hashed locally instead of through the daemon", file=sys.stderr)
+            input_length, input_head = hash_chunks(chain([payload], iter_input_chunks(stream, args)), hashers)
+            return input_length, input_head, [hasher.hexdigest() for hasher in hashers]
+        input_length, input_head = len(payload), payload[:100]
+    digests = client.request([(op, algorithm, args.length, payload) for algorithm in args.algorithms])
+    return input_length, input_head, [digest.hex() for digest in digests]
+
+
+def tee_chunks(chunks, write): # '--tee', Forwards each chunk downstream before it is hashed, nothing is held beyond the current chunk
+    for chunk in chunks:
+        write(chunk)
+        yield chunk
+
+
+def tee_input(stream, hashers, args, stats=None): # '--tee', Copies the input to stdout or -s FILE while hashing, reports the digest at EOF, returns the exit code
+    name = args.file or '-'
+    try:
+        output =(
+            open(args.save, 'wb') if args.save
+            else open(sys.stdout.fileno(), 'wb', closefd=False)
+        )
+    except IOError as e:
+        print(f"Error saving to file: {e}", file=sys.stderr)
+        return 1
+
+    chunks = iter_input_chunks(stream, args)
+    if stats:
+        chunks = stats.timed_iter(chunks, 'read', 'forward and hash', 'bytes read')
+    with output, get_hasher_executor(hashers, args) as executor:
+        length, _ =(
+            hash_chunks(tee_chunks(chunks, output.write), hashers, executor)
+        )
+
+    report = b''.join(format_manifest_line(hasher.hexdigest(), name) for hasher in hashers)
+    if args.digest_file:
+        try:
+            with open(args.digest_file, 'wb') as f:
+                f.write(report)
+        except IOError as e:
+            print(f"Error saving to file: {e}", file=sys.stderr)
+            return 1
+    else:
+        sys.stderr.buffer.write(report)
+        sys.stderr.flush()
+
+    if args.verbose >= 1:
+        print(f"Forwarded {length} bytes with {', '.join(algorithm.upper() for algorithm in args.algorithms)}", file=sys.stderr)
+    return 0
+
+
+def pread_exact(fd, length, offset): # os.pread until 'length' bytes or end of file, regular files can still return short reads
+    data = os.pread(fd, length, offset)
+    if len(data) == length or not data:
+        return data
+    parts = [data]
+    received = len(data)
+    while received < length:
+        part = os.pread(fd, length - received, offset + received)
+        if not part:
+            break
+        parts.append(part)
+        received += len(part)
+    return b''.join(parts)
+
+
+# '--tree', BLAKE2 tree layout, reproducible by any BLAKE2 implementation with tree parameters:
+#   every node uses fanout=0 (unlimited), depth=2, leaf_size=L, inner_size=digest_size=D
+#   leaf i hashes bytes [i*L, (i+1)*L) with node_depth=0, node_offset=i, last_node set on the final leaf
+#   the root hashes the concatenated leaf digests in order with node_depth=1, node_offset=0, last_node=True
+#   an empty file is a single empty leaf
+def hash_tree_leaf(fd, index, last, constructor, params, file_size, drop=False): # '--tree', One leaf digest, reads stop at the size seen when hashing began even if the file is still growing
+    leaf_size = params['leaf_size']
+    data = pread_exact(fd, min(leaf_size, file_size - index * leaf_size), index * leaf_size)
+    if drop:
+        fadvise(fd, index * leaf_size, len(data), os.POSIX_FADV_DONTNEED)
+    return constructor(data, node_offset=index, node_depth=0, last_node=last, **params).digest()
+
+
+def hash_tree(fd, algorithm, digest_size, leaf_size, workers, io_mode='default'): # '--tree', Hashes leaves concurrently with os.pread, returns (root hex digest, file size)
+    from concurrent.futures import ThreadPoolExecutor
+    constructor = TREE_CONSTRUCTORS[algorithm]
+    params = dict(digest_size=digest_size, fanout=0, depth=2, leaf_size=leaf_size, inner_size=digest_size)
+    file_size = os.fstat(fd).st_size
+    leaves = max(1, -(-file_size // leaf_size))
+    if is_direct(fd): # '--io direct', pread fills unaligned bytes objects, so leaves go through the cache and are dropped behind instead
+        clear_direct(fd)
+    drop = io_mode != 'default' and hasattr(os, 'posix_fadvise')
+
+    def hash_leaf(index): # hashlib releases the GIL while hashing, so leaves really run in parallel
+        return hash_tree_leaf(fd, index, index == leaves - 1, constructor, params, file_size, drop)
+
+    root = constructor(node_offset=0, node_depth=1, last_node=True, **params)
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _, future in ordered_map(executor, hash_leaf, range(leaves), workers * 2):
+            root.update(future.result())
+    return root.hexdigest(), file_size
+
+
+def get_checkpoint_path(args): # '--incremental', Sidecar next to the file unless --checkpoint says otherwise
+    return args.checkpoint or args.file + CHECKPOINT_SUFFIX
+
+
+def load_checkpoint(path, algorithm, digest_size, leaf_size, info): # '--incremental', Stored leaf digests, or (b'', reason) when the sidecar is missing, unreadable or for another file or layout
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(CHECKPOINT_HEADER.size)
+            if len(header) < CHECKPOINT_HEADER.size:
+                return b'', 'no checkpoint'
+            magic, stored_algorithm, stored_digest_size, stored_leaf_size, device, inode, count = CHECKPOINT_HEADER.unpack(header)
+            if magic != CHECKPOINT_MAGIC:
+                return b'', 'not a checkpoint file'
+            if (stored_algorithm.rstrip(b'\0').decode(errors='replace'), stored_digest_size, stored_leaf_size) != (algorithm, digest_size, leaf_size):
+                return b'', 'checkpoint made with another algorithm, length or leaf size'
+            if (device, inode) != (info.st_dev, info.st_ino):
+                return b'', 'file was replaced'
+            digests = f.read(count * digest_size)
+    except FileNotFoundError:
+        return b'', 'no checkpoint'
+    except (IOError, struct.error) as e:
+        return b'', f"unreadable checkpoint ({e})"
+    if len(digests) != count * digest_size:
+        return b'', 'truncated checkpoint'
+    return digests, None
+
+
+def save_checkpoint(path, algorithm, digest_size, leaf_size, info, digests): # '--incremental', Written beside the target and renamed over it, a crash leaves the old checkpoint intact
+    header = CHECKPOINT_HEADER.pack(
+        CHECKPOINT_MAGIC, algorithm.encode(), digest_size, leaf_size, info.st_dev, info.st_ino, len(digests) // digest_size
+    )
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(header)
+            f.write(digests)
+        os.replace(temporary, path)
+    except IOError:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+        raise
+
+
+def hash_incremental(fd, algorithm, digest_size, leaf_size, workers, checkpoint, io_mode='default'): # '--incremental', '--tree' digest reusing checkpointed leaves, returns (root hex digest, file size, leaves reused, bytes read, reason for any full rehash)
+    from concurrent.futures import ThreadPoolExecutor
+    constructor = TREE_CONSTRUCTORS[algorithm]
+    params = dict(digest_size=digest_size, fanout=0, depth=2, leaf_size=leaf_size, inner_size=digest_size)
+    info = os.fstat(fd)
+    file_size = info.st_size
+    leaves = max(1, -(-file_size // leaf_size))
+    if is_direct(fd):
+        clear_direct(fd)
+    drop = io_mode != 'default' and hasattr(os, 'posix_fadvise')
+
+    stored, reason = load_checkpoint(checkpoint, algorithm, digest_size, leaf_size, info)
+    reused = len(stored) // digest_size
+    read = 0
+    if reused > leaves - 1: # Stored leaves were hashed as non-final, the ones the file no longer extends past are dropped
+        reused = leaves - 1
+        stored = stored[:reused * digest_size]
+    # Appends never touch complete leaves, so the first and last reused ones are re-hashed to catch files that were rewritten
+    # or truncated and refilled, an in-place edit between them goes unnoticed, which --incremental documents as append-only
+    for index in sorted({0, reused - 1}) if reused else ():
+        read += leaf_size
+        if hash_tree_leaf(fd, index, False, constructor, params, file_size, drop) != stored[index * digest_size:(index + 1) * digest_size]:
+            stored, reused, reason = b'', 0, 'earlier content changed'
+            break
+
+    def hash_leaf(index):
+        return hash_tree_leaf(fd, index, index == leaves - 1, constructor, params, file_size, drop)
+
+    digests = [stored]
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _, future in ordered_map(executor, hash_leaf, range(reused, leaves), workers * 2):
+            digests.append(future.result())
+    read += file_size - reused * leaf_size
+    root = constructor(node_offset=0, node_depth=1, last_node=True, **params)
+    root.update(b''.join(digests))
+    complete = b''.join(digests[:-1]) # The final leaf is hashed as the last node, its digest changes once the file grows past it
+    if len(complete) > len(stored):
+        try:
+            save_checkpoint(checkpoint, algorithm, digest_size, leaf_size, info, complete)
+        except IOError as e: # The digest is still right, the next run just starts over
+            print(f"byxhash: cannot save checkpoint: {e}", file=sys.stderr)
+    return root.hexdigest(), file_size, reused, read, reason
+
+
+# '--sample', Fingerprint layout, blake2b with person=b'byxhash-sample' and the chosen digest size over:
+#   SAMPLE_HEADER (file size, block count N, block size B, big-endian)
+#   then the whole file if it is at most N*B bytes, otherwise N blocks of B bytes at offsets i*(size-B)//(N-1), i = 0..N-1
+#   so block 0 is the head, block N-1 the tail and the rest are evenly spaced in between
+def fingerprint_file(path, blocks=DEFAULT_SAMPLE_BLOCKS, block_size=DEFAULT_SAMPLE_SIZE, digest_size=64): # '--sample', Reads at most blocks*block_size bytes with os.pread, returns the hex fingerprint
+    with open(path, 'rb', buffering=0) as f:
+        fd = f.fileno()
+        size = os.fstat(fd).st_size
+        hasher = blake2b(SAMPLE_HEADER.pack(size, blocks, block_size), digest_size=digest_size, person=SAMPLE_PERSON)
+        if size <= blocks * block_size:
+            hasher.update(pread_exact(fd, size, 0))
+        else:
+            for index in range(blocks):
+                hasher.update(pread_exact(fd, block_size, index * (size - block_size) // (blocks - 1)))
+    return hasher.hexdigest()
+
+
+def sample_input(args): # '--sample', Fingerprints -f FILE, labelled in every output format, returns the exit code
+    digest_size = algorithm_length('blake2b', args.length) or MAX_DIGEST_SIZES['blake2b']
+    try:
+        size = os.stat(args.file).st_size
+        fingerprint = SAMPLE_PREFIX + fingerprint_file(args.file, args.sample_blocks, args.sample_size, digest_size)
+    except IOError as e:
+        print(f"Error reading file: {e}")
+        return 1
+
+    if args.compare: # '-c', Accepts the fingerprint with or without its label
+        expected = args.compare if args.compare.startswith(SAMPLE_PREFIX) else SAMPLE_PREFIX + args.compare
+        compare_hashes([fingerprint], expected, args)
+
+    output_file = get_output_filename(args)
+    if args.quiet:
+        print(fingerprint)
+    else:
+        if args.verbose >= 1:
+            sampled = min(size, args.sample_blocks * args.sample_size)
+            print(f"Input source: file: {args.file}")
+            print(f"Input length: {size} bytes")
+            print(f"Sampled: {sampled} bytes in {args.sample_blocks} blocks of {args.sample_size} bytes ({sampled * 100 / (size or 1):.1f}% of the file)")
+            print("-" * 50)
+        print(f"Fingerprint: {fingerprint}")
+        print("Note: sampled fingerprint for change triage, not a content hash. Run without --sample for a full digest")
+    if output_file:
+        try:
+            with open(output_file, 'w') as f:
+                f.write(fingerprint + '\n')
+            if not args.quiet:
+                print(f"\nFingerprint saved to: {output_file}")
+        except IOError as e:
+            print(f"\nError saving to file: {e}")
+    return 0
+
+
+@lru_cache(maxsize=None)
+def get_gear_table(): # '--cdc', 256 pseudo-random 64-bit values, one per byte value
+    return tuple(
+        int.from_bytes(blake2b(bytes([value]), digest_size=8, person=GEAR_PERSON).digest(), 'little')
+        for value in range(256)
+    )
+
+
+@lru_cache(maxsize=None)
+def load_numpy(): # '--cdc', Optional, the cut point search is vectorised when numpy is installed and a plain loop otherwise
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+@lru_cache(maxsize=None)
+def note_slow_cdc(): # '--cdc', Printed once per process, so long inputs explain their speed without flooding -r runs
+    print("byxhash: numpy is not installed, the --cdc cut search runs in pure Python at a few MB/s (pip install numpy for about 100 MB/s)", file=sys.stderr)
+
+
+def cdc_masks(avg_size): # '--cdc', FastCDC normalised chunking, a stricter mask below the average size and a looser one above it
+    bits = avg_size.bit_length() - 1
+    return (
+        ((1 << (bits + 1)) - 1) << (64 - bits - 1),
+        ((1 << (bits - 1)) - 1) << (64 - bits + 1),
+    )
+
+
+def gear_candidates(data, skip, mask_s, mask_l): # '--cdc', Positions from 'skip' on whose Gear fingerprint passes each mask, returns (strict, loose) sorted lists
+    gear = get_gear_table()
+    numpy = load_numpy()
+    strict = []
+    loose = []
+    if numpy is not None: # fp[i] = sum(gear[data[i - j]] << j for j < 64) mod 2^64, built by doubling the window six times over each tile
+        table = numpy.array(gear, dtype=numpy.uint64)
+        source = numpy.frombuffer(data, dtype=numpy.uint8)
+        fingerprints = numpy.empty(CDC_SCAN_TILE + GEAR_WINDOW - 1, dtype=numpy.uint64)
+        shifted = numpy.empty_like(fingerprints)
+        for tile in range(skip, len(data), CDC_SCAN_TILE):
+            begin = max(0, tile - GEAR_WINDOW + 1) # Tiles overlap by the window, so every position sees its 63 predecessors
+            size = min(len(data), tile + CDC_SCAN_TILE) - begin
+            window = fingerprints[:size]
+            numpy.take(table, source[begin:begin + size], out=window)
+            width = 1
+            while width < min(GEAR_WINDOW, size):
+                numpy.left_shift(window[:-width], numpy.uint64(width), out=shifted[:size - width])
+                numpy.add(window[width:], shifted[:size - width], out=window[width:])
+                width *= 2
+            window = window[tile - begin:]
+            hits = numpy.flatnonzero((window & numpy.uint64(mask_l)) == 0)
+            loose.extend((hits + tile).tolist())
+            strict.extend((hits[(window[hits] & numpy.uint64(mask_s)) == 0] + tile).tolist())
+        return strict, loose
+
+    fingerprint = 0
+    for byte in data[max(0, skip - GEAR_WINDOW):skip]:
+        fingerprint = ((fingerprint << 1) + gear[byte]) & GEAR_MASK
+    for position, byte in enumerate(data[skip:], skip):
+        fingerprint = ((fingerprint << 1) + gear[byte]) & GEAR_MASK
+        if not fingerprint & mask_l:
+            loose.append(position)
+            if not fingerprint & mask_s:
+                strict.append(position)
+    return strict, loose
+
+
+def next_cut(strict, loose, start, end, min_size, avg_size, max_size): # '--cdc', Length of the chunk starting at 'start', the strict mask applies up to the average size
+    last = min(end, start + max_size) - 1
+    if last - start + 1 <= min_size:
+        return last - start + 1
+    first = start + min_size - 1
+    normal = start + avg_size - 1
+    index = bisect_left(strict, first)
+    if index < len(strict) and strict[index] < normal and strict[index] <= last:
+        return strict[index] - start + 1
+    index = bisect_left(loose, max(first, normal))
+    if index < len(loose) and loose[index] <= last:
+        return loose[index] - start + 1
+    return last - start + 1
+
+
+def iter_cdc_chunks(chunks, min_size=DEFAULT_CDC_MIN, avg_size=DEFAULT_CDC_AVG, max_size=DEFAULT_CDC_MAX): # '--cdc', Yields (offset, chunk) content-defined chunks of a chunk stream, memory bounded by one read plus max_size
+    mask_s, mask_l = cdc_masks(avg_size)
+    history = pending = b''
+    carried = ([], []) # Candidates already found in the pending bytes, positions relative to the next data
+    parts = []
+    buffered = offset = 0
+    for block in chain(chunks, [None]):
+        if block is not None:
+            parts.append(block)
+            buffered += len(block)
+            if buffered < max_size: # Small reads are batched so every scan covers a full chunk, the reader reuses its buffer so they are copied
+                parts[-1] = bytes(block)
+                continue
+        data = b''.join([history, pending] + parts) # Immutable, so the chunks handed out stay valid while the next read reuses its buffer
+        start = len(history)
+        strict, loose = gear_candidates(data, start + len(pending), mask_s, mask_l) if parts else ([], [])
+        if offset >= CDC_SLOW_NOTICE and load_numpy() is None:
+            note_slow_cdc()
+        parts = []
+        buffered = 0
+        strict, loose = carried[0] + strict, carried[1] + loose
+        end = len(data)
+        while end - start >= max_size or (block is None and start < end):
+            length = next_cut(strict, loose, start, end, min_size, avg_size, max_size)
+            yield offset, memoryview(data)[start:start + length]
+            start += length
+            offset += length
+        keep = max(0, start - GEAR_WINDOW + 1)
+        history, pending = data[keep:start], data[start:]
+        carried = ([position - keep for position in strict if position >= start], [position - keep for position in loose if position >= start])
+
+
+def cdc_input(stream, hash_func, args, stats=None): # '--cdc', Streams (offset, length, digest) per chunk and the whole input digest, returns the exit code
+    import json
+    name = args.file or '-'
+    try:
+        output = open(args.save, 'wb') if args.save else sys.stdout.buffer
+    except IOError as e:
+        print(f"Error saving to file: {e}")
+        return 1
+
+    hasher = hash_func()
+    count = size = 0
+    chunks = iter_cdc_chunks(iter_input_chunks(stream, args), args.cdc_min, args.cdc_avg, args.cdc_max)
+    if stats:
+        chunks = stats.timed_iter(chunks, 'read and chunk', 'hash and write')
+    write = partial(counted_write, output.write, stats) if stats else output.write
+    for offset, chunk in chunks:
+        digest = hash_func(chunk).hexdigest()
+        hasher.update(chunk)
+        if args.format == 'json':
+            write(json.dumps({'offset': offset, 'length': len(chunk), 'digest': digest}).encode() + b'\n')
+        else:
+            write(f"{offset} {len(chunk)} {digest}\n".encode())
+        count += 1
+        size += len(chunk)
+    if args.format == 'json':
+        record = {'path': name, 'size': size, 'chunks': count, 'digest': hasher.hexdigest(), 'algorithm': args.algorithm}
+        write(json.dumps(record).encode() + b'\n')
+    else:
+        write(format_manifest_line(hasher.hexdigest(), name))
+
+    if args.save:
+        output.close()
+    else:
+        output.flush()
+    if stats:
+        stats.count('bytes read', size)
+        stats.count('chunks', count)
+
+    if args.verbose >= 1:
+        print(f"Chunked {size} bytes into {count} chunk{'s' if count != 1 else ''} (average {size // (count or 1)} bytes) with {args.algorithm.upper()}", file=sys.stderr)
+        print(f"Chunk sizes: {args.cdc_min} min, {args.cdc_avg} average, {args.cdc_max} max, cut search: {'numpy' if load_numpy() else 'python'}", file=sys.stderr)
+    return 0
+
+
+def minhash_signature(chunks, size=MINHASH_SIZE): # '--similarity', One-permutation MinHash over the (offset, chunk) CDC stream, returns 'size' 64-bit values
+    bins = [None] * size
+    for _, chunk in chunks:
+        value = int.from_bytes(blake2b(chunk, digest_size=8, person=MINHASH_PERSON).digest(), 'little')
+        index = value % size
+        value //= size
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    if all(value is None for value in bins): # Empty input
+        return [GEAR_MASK] * size
+    signature = list(bins)
+    for index, value in enumerate(bins): # Densification, an empty bin borrows from the next filled one and is offset by the distance
+        if value is None:
+            distance = 1
+            while bins[(index + distance) % size] is None:
+                distance += 1
+            signature[index] = (bins[(index + distance) % size] + distance * MINHASH_DENSIFY_STEP) & GEAR_MASK
+    return signature
+
+
+def encode_signature(signature): # '--similarity', Labelled hex, so signatures are never taken for content hashes
+    return SIMILARITY_PREFIX + struct.pack(f'<{len(signature)}Q', *signature).hex()
+
+
+def decode_signature(text): # '--similarity', Inverse of encode_signature, ValueError if it is not a signature of this layout
+    data = bytes.fromhex(text[len(SIMILARITY_PREFIX):] if text.startswith(SIMILARITY_PREFIX) else text)
+    if len(data) != MINHASH_SIZE * 8:
+        raise ValueError(f"not a {MINHASH_SIZE} value similarity signature")
+    return list(struct.unpack(f'<{MINHASH_SIZE}Q', data))
+
+
+def estimate_similarity(first, second): # '--similarity', Estimated Jaccard similarity of the two files' chunk sets
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+def similarity_file(path, min_size=DEFAULT_CDC_MIN, avg_size=DEFAULT_CDC_AVG, max_size=DEFAULT_CDC_MAX, buffer_size=DEFAULT_BUFFER_SIZE): # '--similarity', Pool worker for -r and --similar, returns the encoded signature
+    with open(path, 'rb', buffering=0) as f:
+        return encode_signature(minhash_signature(iter_cdc_chunks(iter_chunks(f, buffer_size), min_size, avg_size, max_size)))
+
+
+def get_similarity_layout(args): # '--index', Everything a signature depends on, an index only holds signatures of one layout
+    return f"minhash {MINHASH_SIZE}, bands {LSH_BANDS}x{MINHASH_SIZE // LSH_BANDS}, cdc {args.cdc_min}/{args.cdc_avg}/{args.cdc_max}"
+
+
+def band_buckets(signature): # '--index', (band, bucket) pairs, files agreeing on every row of a band share its bucket
+    rows = MINHASH_SIZE // LSH_BANDS
+    return [
+        (band, int.from_bytes(blake2b(struct.pack(f'<{rows}Q', *signature[band * rows:(band + 1) * rows]), digest_size=8).digest(), 'little', signed=True))
+        for band in range(LSH_BANDS)
+    ]
+
+
+class SimilarityIndex: # '--index', On-disk LSH index of similarity signatures, a query only reads the buckets its own bands fall in
+    def __init__(self, path, layout):
+        import sqlite3
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SIMILARITY_SCHEMA)
+        stored = self.db.execute("SELECT value FROM meta WHERE key = 'layout'").fetchone()
+        if stored is None:
+            self.db.execute("INSERT INTO meta VALUES ('layout', ?)", (layout,))
+        elif stored[0] != layout:
+            self.db.close()
+            raise ValueError(f"index holds '{stored[0]}' signatures, not '{layout}'")
+
+    def add(self, path, signature): # Replaces any earlier signature of the same path
+        path = os.path.abspath(path)
+        row = self.db.execute('SELECT id FROM signatures WHERE path = ?', (path,)).fetchone()
+        if row:
+            self.db.execute('DELETE FROM buckets WHERE id = ?', row)
+            self.db.execute('DELETE FROM signatures WHERE id = ?', row)
+        entry = self.db.execute(
+            'INSERT INTO signatures (path, signature) VALUES (?, ?)', (path, struct.pack(f'<{MINHASH_SIZE}Q', *signature))
+        ).lastrowid
+        self.db.executemany('INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)', [bucket + (entry,) for bucket in band_buckets(signature)])
+
+    def query(self, signature, threshold): # Returns ([(similarity, path)] best first, candidates checked)
+        candidates = set()
+        for band, bucket in band_buckets(signature):
+            candidates.update(row[0] for row in self.db.execute('SELECT id FROM buckets WHERE band = ? AND bucket = ?', (band, bucket)))
+        matches = []
+        for entry in candidates:
+            path, stored = self.db.execute('SELECT path, signature FROM signatures WHERE id = ?', (entry,)).fetchone()
+            similarity = estimate_similarity(signature, struct.unpack(f'<{MINHASH_SIZE}Q', stored))
+            if similarity >= threshold:
+                matches.append((similarity, path))
+        matches.sort(key=lambda match: (-match[0], match[1]))
+        return matches, len(candidates)
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def open_similarity_index(args): # '--index', Opens or creates the index, prints the error and returns None if it is unusable
+    import sqlite3
+    try:
+        return SimilarityIndex(args.index, get_similarity_layout(args))
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"Error opening index: {e}")
+        return None
+
+
+def similarity_input(stream, args, stats=None): # '--similarity', Signature of the single input, optionally recorded in --index, returns the exit code
+    chunks = iter_cdc_chunks(iter_input_chunks(stream, args), args.cdc_min, args.cdc_avg, args.cdc_max)
+    if stats:
+        chunks = stats.timed_iter(chunks, 'read and chunk', 'minhash')
+    signature = minhash_signature(chunks)
+    encoded = encode_signature(signature)
+    if args.index:
+        index = open_similarity_index(args)
+        if index is None:
+            return 1
+        index.add(args.file, signature)
+        index.close()
+
+    if args.quiet:
+        print(encoded)
+    else:
+        if args.verbose >= 1:
+            print(f"Input source: {f'file: {args.file}' if args.file else 'stdin' if args.input is None else 'string'}")
+            print(f"Layout: {get_similarity_layout(args)}")
+            if args.index:
+                print(f"Indexed in: {args.index}")
+            print("-" * 50)
+        print(f"Similarity: {encoded}")
+    if args.save:
+        try:
+            with open(args.save, 'w') as f:
+                f.write(encoded + '\n')
+        except IOError as e:
+            print(f"\nError saving to file: {e}")
+    return 0
+
+
+def find_similar(path, args, stats=None): # '--similar', Lists indexed files whose estimated similarity to 'path' reaches --threshold, returns 0 if any were found
+    import json
+    try:
+        signature = decode_signature(similarity_file(path, args.cdc_min, args.cdc_avg, args.cdc_max, args.buffer_size))
+    except IOError as e:
+        print(f"Error reading file: {e}")
+        return 1
+    if stats:
+        stats.lap('signature')
+    index = open_similarity_index(args)
+    if index is None:
+        return 1
+    matches, candidates = index.query(signature, args.threshold)
+    total = index.db.execute('SELECT count(*) FROM signatures').fetchone()[0]
+    index.close()
+    if stats:
+        stats.lap('query')
+        stats.count('candidates', candidates)
+
+    matches = [(similarity, match) for similarity, match in matches if match != os.path.abspath(path)]
+    for similarity, match in matches:
+        if args.format == 'json':
+            print(json.dumps({'path': match, 'similarity': similarity}))
+        else:
+            print(f"{similarity:.3f}  {match}")
+    if args.verbose >= 1:
+        print(f"Checked {candidates} LSH candidates of {total} indexed files, {len(matches)} at or above {args.threshold}", file=sys.stderr)
+    return 0 if matches else 1
+
+
+def directory_mmap_threshold(args): # '--mmap', Multi-file modes only map with an explicit --mmap, one file truncated by another process while mapped would SIGBUS the whole run
+    return args.mmap_threshold if args.mmap else None
+
+
+def digest_file(path, hash_func, buffer_size=DEFAULT_BUFFER_SIZE, io_mode='default', mmap_threshold=None, sparse=False): # Hashes a single file by path, shared by the library API, the directory modes and their pool workers
+    hasher = hash_func()
+    with open_input_file(path, io_mode) as f:
+        hash_chunks(iter_file_chunks(f, buffer_size, io_mode, mmap_threshold=mmap_threshold, sparse=sparse), [hasher])
+    return hasher.hexdigest()
+
+
+class HashCache: # '--cache', Persistent digest cache keyed on file identity, only ever touched from the main thread
+    def __init__(self, path, max_entries=DEFAULT_CACHE_ENTRIES, refresh=False):
+        import sqlite3
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(CACHE_SCHEMA)
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self.clock = time.time_ns()
+        self.pending = {} # (path, algorithm, digest size) -> identity of files handed to a worker, stored once their digest comes back
+        self.touched = []
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, path, algorithm, digest_size): # Returns the cached digest for an unchanged file without reading it, None on a miss
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        if not self.refresh:
+            row = self.db.execute(
+                'SELECT digest FROM hashes WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ? '
+                'AND algorithm = ? AND digest_size = ?',
+                identity + (algorithm, digest_size)
+            ).fetchone()
+            if row:
+                self.hits += 1
+                self.touched.append((self.clock,) + identity[:2] + (algorithm, digest_size))
+                return row[0]
+        self.misses += 1
+        self.pending[path, algorithm, digest_size] = identity
+        return None
+
+    def store(self, path, algorithm, digest_size, digest): # Records a freshly computed digest against the identity seen at lookup time
+        identity = self.pending.pop((path, algorithm, digest_size), None)
+        if identity is None or time.time_ns() - identity[3] < RACY_WINDOW_NS:
+            return
+        self.db.execute(
+            'INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            identity + (algorithm, digest_size, digest, os.path.abspath(path), self.clock)
+        )
+
+    def paths_for(self, digest): # '--lookup', Reverse lookup of every cached path with this digest
+        rows = self.db.execute(
+            'SELECT DISTINCT path FROM hashes WHERE digest = ? ORDER BY path', (digest.lower(),)
+        )
+        return [row[0] for row in rows]
+
+    def close(self): # Refreshes recency of hits, evicts least recently used entries past max_entries and commits
+        self.db.executemany(
+            'UPDATE hashes SET last_used = ? WHERE device = ? AND inode = ? AND algorithm = ? AND digest_size = ?',
+            self.touched
+        )
+        count = self.db.execute('SELECT COUNT(*) FROM hashes').fetchone()[0]
+        if count > self.max_entries:
+            self.db.execute(
+                'DELETE FROM hashes WHERE (device, inode, algorithm, digest_size) IN ('
+                'SELECT device, inode, algorithm, digest_size FROM hashes ORDER BY last_used LIMIT ?)',
+                (count - self.max_entries,)
+            )
+        self.db.commit()
+        self.db.close()
+
+
+def get_cache_path(args): # '--cache', Cache location, defaults to the XDG cache directory
+    if args.cache:
+        return args.cache
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'byxhash', 'cache.sqlite3')
+
+
+def open_cache(args): # '--cache', '--no-cache', '--refresh', Opens the digest cache, hashing carries on uncached if it is unusable
+    import sqlite3
+    if args.no_cache:
+        return None
+    try:
+        return HashCache(get_cache_path(args), args.cache_size, args.refresh)
+    except (sqlite3.Error, OSError) as e:
+        print(f"byxhash: cache disabled: {e}", file=sys.stderr)
+        return None
+
+
+def lookup_paths(digest, args): # '--lookup', Prints every cached path with a matching digest, returns 0 if any were found
+    import sqlite3
+    try:
+        cache = HashCache(get_cache_path(args), args.cache_size)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error opening cache: {e}")
+        return 1
+    paths = cache.paths_for(digest)
+    cache.close()
+    for path in paths:
+        print(path)
+    return 0 if paths else 1
+
+
+def walk_directory(root): # '-r', '--recursive', Walks a tree with os.scandir, returns regular file paths ordered by inode to cut seeks
+    entries = []
+    errors = []
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        entries.append((entry.inode(), entry.path))
+        except OSError as e:
+            errors.append(e)
+    entries.sort()
+    return [path for _, path in entries], errors
+
+
+def format_manifest_line(digest, path): # sha256sum/b2sum line format, names containing a backslash or newline are escaped behind a leading '\'
+    name = os.fsencode(path)
+    if b'\\' in name or b'\n' in name:
+        name = name.replace(b'\\', b'\\\\').replace(b'\n', b'\\n')
+        return b'\\' + digest.encode() + b'  ' + name + b'\n'
+    return digest.encode() + b'  ' + name + b'\n'
+
+
+def format_check_line(path, status): # '--check', GNU '*sum -c' status line, names containing a backslash or newline are escaped behind a leading '\' as in format_manifest_line
+    name = os.fsencode(path)
+    if b'\\' in name or b'\n' in name:
+        name = b'\\' + name.replace(b'\\', b'\\\\').replace(b'\n', b'\\n')
+    return name + b': ' + status + b'\n'
+
+
+def get_executor(args): # '-j', '--workers', '--pool', Builds the worker pool used by the directory and manifest modes
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    workers = max(1, args.workers)
+    if args.pool == 'process':
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def completed_future(result): # Wraps an already known result (e.g. a cache hit) so it flows through the pool maps unchanged
+    from concurrent.futures import Future
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def ordered_map(executor, fn, items, window, lookup=None): # Like executor.map but keeps at most 'window' tasks in flight, yields (item, future) in input order
+    in_flight = deque()
+    for item in items:
+        known = lookup(item) if lookup else None
+        in_flight.append((item, executor.submit(fn, item) if known is None else completed_future(known)))
+        if len(in_flight) >= window:
+            yield in_flight.popleft()
+    while in_flight:
+        yield in_flight.popleft()
+
+
+def unordered_map(executor, fn, items, window, lookup=None): # Keeps at most 'window' tasks in flight, yields (item, future) as each one completes
+    from concurrent.futures import FIRST_COMPLETED, wait
+    items = iter(items)
+    in_flight = {}
+    while True:
+        for item in items:
+            known = lookup(item) if lookup else None
+            if known is not None: # Known results skip the pool and never take a slot
+                yield item, completed_future(known)
+                continue
+            in_flight[executor.submit(fn, item)] = item
+            if len(in_flight) >= window:
+                break
+        if not in_flight:
+            return
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield in_flight.pop(future), future
+
+
+def parse_manifest_line(line, prefix=b''): # '--check', Parses a 'digest  path' manifest line, undoing the leading '\' escape, returns None if malformed
+    line = line.rstrip(b'\r\n')
+    escaped = line.startswith(b'\\')
+    if escaped:
+        line = line[1:]
+    digest, sep, name = line.partition(b' ')
+    if prefix: # '--sample', Fingerprint manifests label every digest, plain digests are not fingerprints
+        if not digest.startswith(prefix):
+            return None
+        digest = digest[len(prefix):]
+    if not sep or not digest or not name or len(digest) % 2:
+        return None
+    if name[:1] in (b' ', b'*'): # Text or binary mode marker
+        name = name[1:]
+    if escaped:
+        name = name.replace(b'\\\\', b'\0').replace(b'\\n', b'\n').replace(b'\0', b'\\')
+    try:
+        bytes.fromhex(digest.decode('ascii'))
+    except ValueError:
+        return None
+    return digest.decode('ascii').lower(), os.fsdecode(name)
+
+
+def verify_file(entry, buffer_size=DEFAULT_BUFFER_SIZE, io_mode='default', mmap_threshold=None, sparse=False): # '--check', Pool worker, entry is (size, path, expected digest, hash function, digest size)
+    return digest_file(entry[1], entry[3], buffer_size, io_mode, mmap_threshold, sparse)
+
+
+def verify_sample(entry, blocks=DEFAULT_SAMPLE_BLOCKS, block_size=DEFAULT_SAMPLE_SIZE): # '--check', '--sample', Pool worker, FAILED means the file changed since the fingerprint was taken
+    return fingerprint_file(entry[1], blocks, block_size, entry[4])
+
+
+def check_manifest(manifest, args, stats=None): # '--check', Verifies a manifest in parallel, largest files first, returns 0 if every file matches
+    try:
+        source = sys.stdin.buffer if manifest == '-' else open(manifest, 'rb')
+    except IOError as e:
+        print(f"Error reading manifest: {e}")
+        return 1
+
+    output = sys.stdout.buffer
+    absent = []
+    malformed = 0
+    entries = []
+    hash_funcs = {}
+    with source:
+        for line in source:
+            if not line.strip():
+                continue
+            parsed = parse_manifest_line(line, SAMPLE_PREFIX.encode() if args.sample else b'')
+            if parsed is None:
+                malformed += 1
+                continue
+            digest, path = parsed
+            length = algorithm_length(args.algorithm, args.length) # b2sum style: without -l the digest length comes from the manifest itself
+            if length is None and args.algorithm != 'sha256':
+                length = len(digest) // 2
+                if length > MAX_DIGEST_SIZES[args.algorithm]:
+                    malformed += 1
+                    continue
+            if length not in hash_funcs:
+                hash_func = get_hash_function(args.algorithm, length)
+                hash_funcs[length] = hash_func, hash_func().digest_size
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                absent.append(path)
+                if args.fail_fast:
+                    break
+                continue
+            entries.append((size, path, digest) + hash_funcs[length])
+
+    if malformed:
+        print(f"byxhash: WARNING: {malformed} line{'s are' if malformed > 1 else ' is'} improperly formatted", file=sys.stderr)
+    entries.sort(key=lambda entry: entry[0], reverse=True) # Largest first, so one big file never runs alone at the end
+    if stats:
+        stats.lap('parse')
+
+    passed = 0
+    failed = 0
+    missing = len(absent)
+    try: # Only reads are counted per file, a write error (closed pipe, full disk) ends the run
+        for path in absent:
+            output.write(format_check_line(path, b'MISSING'))
+        if args.fail_fast and absent:
+            output.flush()
+            return 1
+    except IOError as e:
+        abort_output(output, e)
+        return 1
+    cache = open_cache(args) if args.trust_cache and not args.sample else None # Verifying rereads the data unless told otherwise, fingerprints are cheaper to redo than to look up
+    lookup = (lambda entry: cache.lookup(entry[1], args.algorithm, entry[4])) if cache else None
+    worker =(
+        partial(verify_sample, blocks=args.sample_blocks, block_size=args.sample_size) if args.sample
+        else partial(verify_file, buffer_size=args.buffer_size, io_mode=args.io, mmap_threshold=directory_mmap_threshold(args), sparse=args.sparse)
+    )
+    try:
+        with get_executor(args) as executor:
+            for entry, future in unordered_map(executor, worker, entries, max(1, args.workers) * 4, lookup):
+                try:
+                    computed = future.result()
+                except OSError:
+                    output.write(format_check_line(entry[1], b'FAILED open or read'))
+                    missing += 1
+                else:
+                    if cache:
+                        cache.store(entry[1], args.algorithm, entry[4], computed)
+                    if stats:
+                        stats.count('files')
+                        stats.count('bytes verified', entry[0])
+                    if computed == entry[2]:
+                        passed += 1
+                        if not args.quiet:
+                            output.write(format_check_line(entry[1], b'OK'))
+                    else:
+                        failed += 1
+                        output.write(format_check_line(entry[1], b'FAILED'))
+                if args.fail_fast and (failed or missing):
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    break
+        output.flush()
+    except IOError as e:
+        abort_output(output, e)
+        if cache:
+            cache.close()
+        return 1
+    if cache:
+        cache.close()
+    if stats:
+        stats.lap('verify')
+        if cache:
+            stats.count('cache hits', cache.hits)
+            stats.count('cache misses', cache.misses)
+
+    if failed:
+        print(f"byxhash: WARNING: {failed} computed checksum{'s' if failed > 1 else ''} did NOT match", file=sys.stderr)
+    if missing:
+        print(f"byxhash: WARNING: {missing} listed file{'s' if missing > 1 else ''} could not be read", file=sys.stderr)
+    if args.verbose >= 1:
+        print(f"Verified {passed} of {passed + failed + missing} files with {args.algorithm.upper()}", file=sys.stderr)
+    return 0 if passed and not (failed or missing) else 1
+
+
+def hash_directory(root, hash_func, args, stats=None): # '-r', '--recursive', Hashes a directory tree in parallel and streams the manifest, returns the exit code
+    if not os.path.isdir(root):
+        print(f"Error: Not a directory: {root}")
+        return 1
+
+    paths, errors =(
+        walk_directory(root)
+    )
+    for error in errors:
+        print(f"byxhash: {error}", file=sys.stderr)
+    if stats:
+        stats.lap('walk')
+
+    try:
+        output = open(args.save, 'wb') if args.save else sys.stdout.buffer
+    except IOError as e:
+        print(f"Error saving to file: {e}")
+        return 1
+
+    hashed = 0
+    failed = len(errors)
+    digest_size = hash_func().digest_size
+    cache = open_cache(args) if not args.sample and not args.similarity else None # Fingerprints are cheaper to redo than to look up, signatures are not digests
+    lookup = partial(cache.lookup, algorithm=args.algorithm, digest_size=digest_size) if cache else None
+    worker =(
+        partial(fingerprint_file, blocks=args.sample_blocks, block_size=args.sample_size, digest_size=digest_size) if args.sample
+        else partial(similarity_file, min_size=args.cdc_min, avg_size=args.cdc_avg, max_size=args.cdc_max, buffer_size=args.buffer_size) if args.similarity
+        else partial(digest_file, hash_func=hash_func, buffer_size=args.buffer_size, io_mode=args.io, mmap_threshold=directory_mmap_threshold(args), sparse=args.sparse)
+    )
+    label = SAMPLE_PREFIX if args.sample else ''
+    index = open_similarity_index(args) if args.similarity and args.index else None # '--index', Signatures are recorded as they come back
+    if args.similarity and args.index and index is None:
+        return 1
+    write = partial(counted_write, output.write, stats) if stats else output.write
+    try:
+        with get_executor(args) as executor:
+            for path, future in ordered_map(executor, worker, paths, max(1, args.workers) * 4, lookup):
+                try:
+                    digest = future.result()
+                except OSError as e: # Only the file being read, the run carries on
+                    print(f"byxhash: {path}: {e.strerror or e}", file=sys.stderr)
+                    failed += 1
+                    continue
+                write(format_manifest_line(label + digest, path))
+                hashed += 1
+                if cache:
+                    cache.store(path, args.algorithm, digest_size, digest)
+                if index:
+                    index.add(path, decode_signature(digest))
+    except IOError as e: # The manifest itself failed (closed pipe, full disk), there is nowhere left to report to
+        abort_output(output, e)
+        failed += 1
+
+    if args.save:
+        output.close()
+    else:
+        output.flush()
+    if cache:
+        cache.close()
+    if index:
+        index.close()
+    if stats:
+        stats.lap('hash')
+        stats.count('files', hashed)
+        if cache:
+            stats.count('cache hits', cache.hits)
+            stats.count('cache misses', cache.misses)
+
+    if args.verbose >= 1:
+        print(f"Hashed {hashed} of {len(paths)} files with {args.algorithm.upper()}", file=sys.stderr)
+        if cache:
+            print(f"Cache: {cache.hits} hits, {cache.misses} misses", file=sys.stderr)
+        if args.save:
+            print(f"Manifest saved to: {args.save}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+zip_handles = threading.local()
+
+
+def get_zip_handle(path): # '--archive', One open ZipFile per thread and archive, so the central directory is parsed once instead of per member
+    import zipfile
+    handles = getattr(zip_handles, 'handles', None)
+    if handles is None:
+        handles = zip_handles.handles = {}
+    if path not in handles:
+        handles[path] = zipfile.ZipFile(path)
+    return handles[path]
+
+
+def digest_zip_member(item, hash_func, buffer_size=DEFAULT_BUFFER_SIZE): # '--archive', Pool worker, item is (archive path, member name, size), streams the member through its decompressor
+    archive, name, _ = item
+    hasher = hash_func()
+    with get_zip_handle(archive).open(name) as member: # The CRC is checked at EOF, a mismatch raises BadZipFile
+        for chunk in iter_chunks(member, buffer_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def iter_tar_members(tar, hash_func, buffer_size=DEFAULT_BUFFER_SIZE, verbose=0): # '--archive', Streams (name, size, digest) of regular members and hard links in archive order, digest None for a link that cannot be resolved
+    hashed = {} # Name -> (size, digest) of regular members, a hard link only ever points back at one stored earlier
+    for member in tar:
+        if member.islnk(): # Extracts as a copy of its target, so it is listed with the target's digest
+            if member.linkname in hashed:
+                yield (member.name,) + hashed[member.linkname]
+            else:
+                print(f"byxhash: {member.name}: hard link to {member.linkname}, which is not a regular member, skipped", file=sys.stderr)
+                yield member.name, 0, None
+            continue
+        if not member.isreg():
+            if verbose >= 1 and not member.isdir():
+                print(f"byxhash: {member.name}: not a regular file, skipped", file=sys.stderr)
+            continue
+        hasher = hash_func()
+        for chunk in iter_chunks(tar.extractfile(member), buffer_size):
+            hasher.update(chunk)
+        hashed[member.name] = member.size, hasher.hexdigest()
+        yield (member.name,) + hashed[member.name]
+
+
+def hash_archive(path, hash_func, args, stats=None): # '--archive', Per-member manifest of a zip or tar archive without extracting it, returns the exit code
+    import json
+    import tarfile
+    import zipfile
+    import zlib
+    try:
+        output = open(args.save, 'wb') if args.save else sys.stdout.buffer
+    except IOError as e:
+        print(f"Error saving to file: {e}")
+        return 1
+
+    members = total = failed = 0
+    write = partial(counted_write, output.write, stats) if stats else output.write
+
+    def report(name, size, digest):
+        nonlocal members, total
+        if args.format == 'json':
+            write(json.dumps({'path': name, 'size': size, 'digest': digest, 'algorithm': args.algorithm}).encode() + b'\n')
+        else:
+            write(format_manifest_line(digest, name))
+        members += 1
+        total += size
+
+    read_errors = (OSError, EOFError, tarfile.TarError, zipfile.BadZipFile, zlib.error)
+    try:
+        if path != '-' and zipfile.is_zipfile(path):
+            kind = 'zip'
+            with zipfile.ZipFile(path) as archive:
+                items = [(path, info.filename, info.file_size) for info in archive.infolist() if not info.is_dir()]
+        else: # tarfile detects gzip, bz2 and xz compression itself, '|' reads it as a stream so stdin works too
+            kind = 'tar'
+            tar =(
+                tarfile.open(fileobj=sys.stdin.buffer, mode='r|*') if path == '-'
+                else tarfile.open(path, mode='r|*')
+            )
+    except read_errors as e:
+        print(f"Error reading archive: {e}")
+        return 1
+
+    try: # Only reads are caught per member or per archive, a write error (closed pipe, full disk) ends the run
+        if kind == 'zip': # Members are independent, each worker seeks to its own and decompresses in parallel
+            worker = partial(digest_zip_member, hash_func=hash_func, buffer_size=args.buffer_size)
+            with get_executor(args) as executor:
+                for (_, name, size), future in ordered_map(executor, worker, items, max(1, args.workers) * 4):
+                    try:
+                        digest = future.result()
+                    except (OSError, EOFError, RuntimeError, NotImplementedError, zipfile.BadZipFile, zlib.error) as e: # Encrypted, unsupported or corrupt members are skipped
+                        print(f"byxhash: {name}: {e}", file=sys.stderr)
+                        failed += 1
+                        continue
+                    report(name, size, digest)
+        else:
+            with tar:
+                tar_members = iter_tar_members(tar, hash_func, args.buffer_size, args.verbose)
+                while True:
+                    try: # A damaged tar stream cannot be resynchronised, so a read error ends the listing
+                        member = next(tar_members, None)
+                    except read_errors as e:
+                        print(f"Error reading archive: {e}")
+                        return 1
+                    if member is None:
+                        break
+                    if member[2] is None: # Already reported, it still fails the run as the manifest is missing a file
+                        failed += 1
+                        continue
+                    report(*member)
+        if args.save:
+            output.close()
+        else:
+            output.flush()
+    except IOError as e:
+        abort_output(output, e)
+        return 1
+    if stats:
+        stats.lap('read and hash')
+        stats.count('members', members)
+        stats.count('bytes read', total)
+
+    if args.verbose >= 1:
+        print(f"Hashed {members} {kind} members ({total} bytes) with {args.algorithm.upper()}" + (f", {failed} failed" if failed else ""), file=sys.stderr)
+    return 1 if failed else 0
+
+
+def iter_tree(roots, on_error): # '--find-duplicates', Streams (path, size, device, inode) of regular files, nothing is kept per file
+    pending = list(roots)
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            info = entry.stat(follow_symlinks=False)
+                            yield entry.path, info.st_size, info.st_dev, info.st_ino
+                    except OSError as e:
+                        on_error(e)
+        except OSError as e:
+            on_error(e)
+
+
+def unique_roots(roots): # '--find-duplicates', Drops repeated roots and roots inside another one, which would list the same files twice
+    kept = []
+    # With a trailing separator everything under a directory sorts right after it, a bare 'r/a-c' would land between 'r/a' and 'r/a/b'
+    for real, root in sorted((os.path.realpath(root).rstrip(os.sep) + os.sep, root) for root in roots):
+        if kept and real.startswith(kept[-1][0]):
+            continue
+        kept.append((real, root))
+    return [root for _, root in kept]
+
+
+def partial_digest(item, hash_func, buffer_size=DEFAULT_BUFFER_SIZE): # '--find-duplicates', Pool worker, item is (node, path, size), returns (digest, complete)
+    if item[2] <= 2 * DUPLICATE_PARTIAL_SIZE: # Head and tail would cover the whole file, so take its real digest now
+        return digest_file(item[1], hash_func, buffer_size), True
+    return fingerprint_file(item[1], 2, DUPLICATE_PARTIAL_SIZE, 32), False
+
+
+def full_digest(item, hash_func, buffer_size=DEFAULT_BUFFER_SIZE, io_mode='default', mmap_threshold=None, sparse=False): # '--find-duplicates', Pool worker, item is (node, path, size)
+    return digest_file(item[1], hash_func, buffer_size, io_mode, mmap_threshold, sparse)
+
+
+def find_duplicates(roots, hash_func, args, stats=None): # '--find-duplicates', Size -> head/tail -> full digest funnel, streams duplicate groups, returns the exit code
+    import json
+    import sqlite3
+    from itertools import groupby
+    for root in roots:
+        if not os.path.isdir(root):
+            print(f"Error: Not a directory: {root}")
+            return 1
+    try:
+        output = open(args.save, 'wb') if args.save else sys.stdout.buffer
+    except IOError as e:
+        print(f"Error saving to file: {e}")
+        return 1
+
+    failed = 0
+    def report_error(e):
+        nonlocal failed
+        failed += 1
+        print(f"byxhash: {e}", file=sys.stderr)
+
+    db = sqlite3.connect('') # Private temporary database on disk, removed on close
+    db.executescript(DUPLICATES_SCHEMA)
+    db.executemany( # Hardlinked paths share a node when --hardlinks is on, filesystems reporting inode 0 never do
+        'INSERT INTO files VALUES (?, ?, ?)',
+        (
+            (os.fsencode(path), size, f'{device}:{inode}'.encode() if args.hardlinks and inode else os.fsencode(path))
+            for path, size, device, inode in iter_tree(unique_roots(roots), report_error)
+        )
+    )
+    scanned = db.execute('SELECT count(*) FROM files').fetchone()[0]
+    if stats:
+        stats.lap('walk')
+        stats.count('files', scanned)
+
+    window = max(1, args.workers) * 4
+    digest_size = hash_func().digest_size
+    with get_executor(args) as executor:
+        candidates = db.execute( # Empty files are all equal and never reported
+            'SELECT node, min(path), size FROM files WHERE size IN '
+            '(SELECT size FROM files WHERE size > 0 GROUP BY size HAVING count(DISTINCT node) > 1) GROUP BY node'
+        )
+        worker = partial(partial_digest, hash_func=hash_func, buffer_size=args.buffer_size)
+        partials = 0
+        for item, future in unordered_map(executor, worker, candidates, window):
+            try:
+                digest, complete = future.result()
+            except OSError as e:
+                report_error(f"{os.fsdecode(item[1])}: {e.strerror or e}")
+                continue
+            db.execute('INSERT INTO partials VALUES (?, ?, ?, ?)', (item[0], item[2], digest, complete))
+            partials += 1
+        if stats:
+            stats.lap('partial hash')
+            stats.count('partial hashes', partials)
+
+        cache = open_cache(args)
+        lookup = (lambda item: cache.lookup(os.fsdecode(item[1]), args.algorithm, digest_size)) if cache else None
+        candidates = db.execute( # Largest first, so one big file never runs alone at the end
+            'SELECT p.node, min(f.path), p.size FROM partials p '
+            'JOIN (SELECT size, digest FROM partials WHERE NOT complete GROUP BY size, digest HAVING count(*) > 1) USING (size, digest) '
+            'JOIN files f ON f.node = p.node WHERE NOT p.complete GROUP BY p.node ORDER BY p.size DESC'
+        )
+        worker = partial(
+            full_digest, hash_func=hash_func, buffer_size=args.buffer_size,
+            io_mode=args.io, mmap_threshold=directory_mmap_threshold(args), sparse=args.sparse
+        )
+        fulls = 0
+        for item, future in unordered_map(executor, worker, candidates, window, lookup):
+            try:
+                digest = future.result()
+            except OSError as e:
+                report_error(f"{os.fsdecode(item[1])}: {e.strerror or e}")
+                continue
+            if cache:
+                cache.store(os.fsdecode(item[1]), args.algorithm, digest_size, digest)
+            db.execute('INSERT INTO fulls VALUES (?, ?, ?)', (item[0], item[2], digest))
+            fulls += 1
+        if cache:
+            cache.close()
+        if stats:
+            stats.lap('full hash')
+            stats.count('full hashes', fulls)
+    db.execute('INSERT INTO fulls SELECT node, size, digest FROM partials WHERE complete')
+
+    rows = db.execute(
+        'SELECT d.size, d.digest, copies, f.path FROM fulls d '
+        'JOIN (SELECT size, digest, count(*) AS copies FROM fulls GROUP BY size, digest HAVING count(*) > 1) USING (size, digest) '
+        'JOIN files f ON f.node = d.node ORDER BY d.size DESC, d.digest, f.path'
+    )
+    groups = 0
+    reclaimable = 0
+    write = partial(counted_write, output.write, stats) if stats else output.write
+    for (size, digest, copies), group in groupby(rows, key=lambda row: row[:3]):
+        paths = [row[3] for row in group]
+        reclaimable += size * (copies - 1)
+        if args.format == 'json':
+            record = {
+                'size': size, 'digest': digest, 'algorithm': args.algorithm,
+                'copies': copies, 'reclaimable': size * (copies - 1),
+                'paths': [os.fsdecode(path) for path in paths],
+            }
+            write(json.dumps(record).encode() + b'\n')
+        else:
+            write((b'\n' if groups else b'') + b''.join(format_manifest_line(digest, os.fsdecode(path)) for path in paths))
+        groups += 1
+    db.close()
+
+    if args.save:
+        output.close()
+    else:
+        output.flush()
+    if stats:
+        stats.count('duplicate groups', groups)
+
+    if args.verbose >= 1:
+        print(f"Scanned {scanned} files, head/tail hashed {partials}, fully hashed {fulls} with {args.algorithm.upper()}", file=sys.stderr)
+        print(f"Found {groups} duplicate group{'s' if groups != 1 else ''}, {reclaimable} bytes reclaimable", file=sys.stderr)
+    return 1 if failed else 0
+
+
+class Inotify: # '--watch', Minimal inotify binding over ctypes, one watch per directory, wd -> directory relative to the root
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.get_errno = ctypes.get_errno
+        self.add_watch = libc.inotify_add_watch # AttributeError where libc has no inotify
+        self.add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            error = self.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.directories = {}
+
+    def add(self, path, relative): # Watching a directory again (e.g. after a rename) returns its old wd, which is relabelled
+        wd = self.add_watch(self.fd, path, WATCH_MASK)
+        if wd < 0:
+            error = self.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        self.directories[wd] = relative
+
+    def read(self, timeout=None): # Waits up to timeout seconds (None blocks), returns [(directory or None, name, mask)]
+        import select
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        data = os.read(self.fd, INOTIFY_READ_SIZE)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((self.directories.get(wd), name, mask))
+            if mask & IN_IGNORED: # The directory is gone or unwatched, its wd may be reused
+                self.directories.pop(wd, None)
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_inotify(): # '--watch', None where inotify is unavailable, the watcher polls instead
+    try:
+        return Inotify()
+    except (OSError, AttributeError, TypeError):
+        return None
+
+
+def watch_signature(info): # '--watch', One 64-bit int per file instead of a stat tuple, keeps the state table small for millions of entries
+    return hash((info.st_size, info.st_mtime_ns, info.st_ino))
+
+
+def scan_watch_tree(root, relative, on_error, on_directory=None): # '--watch', Streams (relative path, signature) of regular files, on_directory runs before each directory is listed
+    pending = [relative]
+    while pending:
+        current = pending.pop()
+        try:
+            if on_directory: # Watched before listing, so a file created mid-scan shows up in one or the other
+                on_directory(current)
+            with os.scandir(os.path.join(root, current) if current else root) as it:
+                for entry in it:
+                    try:
+                        name = os.path.join(current, entry.name) if current else entry.name
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(name)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield name, watch_signature(entry.stat(follow_symlinks=False))
+                    except OSError as e:
+                        on_error(e)
+        except OSError as e:
+            on_error(e)
+
+
+def watch_directory(root, hash_func, args, stats=None): # '--watch', Keeps a live JSON lines manifest of DIR until interrupted, returns the exit code
+    import json
+    import signal
+    if not os.path.isdir(root):
+        print(f"Error: Not a directory: {root}")
+        return 1
+    try:
+        output = open(args.save, 'wb') if args.save else sys.stdout.buffer
+    except IOError as e:
+        print(f"Error saving to file: {e}")
+        return 1
+
+    base = os.fsencode(root)
+    files = {} # Relative path -> signature of the version last reported
+    pending = {} # Relative path -> monotonic time it is looked at again, a burst of changes keeps pushing it back
+    debounce_ns = int(args.debounce * 1e9)
+    notifier = None if args.poll else open_inotify()
+    write = partial(counted_write, output.write, stats) if stats else output.write
+    worker =( # Watched files are being written by definition, one truncated under a mapping would SIGBUS the whole watcher, so they are always read
+        partial(digest_file, hash_func=hash_func, buffer_size=args.buffer_size, io_mode=args.io, mmap_threshold=None, sparse=args.sparse)
+    )
+
+    def report_error(e):
+        print(f"byxhash: {e}", file=sys.stderr)
+
+    def watch(relative):
+        nonlocal notifier
+        if not notifier:
+            return
+        try:
+            notifier.add(os.path.join(base, relative) if relative else base, relative)
+        except OSError as e:
+            if e.errno != errno.ENOSPC:
+                raise
+            print("byxhash: inotify watch limit reached, polling instead (raise fs.inotify.max_user_watches)", file=sys.stderr)
+            notifier.close()
+            notifier = None
+
+    def emit(record):
+        record['path'] = os.fsdecode(os.path.join(base, record['path']))
+        write(json.dumps(record).encode() + b'\n')
+
+    def scan(): # Full pass, anything whose signature moved since it was reported is queued
+        now = time.monotonic()
+        seen = set()
+        for name, signature in scan_watch_tree(base, b'', report_error, watch):
+            seen.add(name)
+            if files.get(name) != signature:
+                pending[name] = now
+        for name in files.keys() - seen:
+            pending[name] = now
+        if stats:
+            stats.count('scans')
+
+    def settle(): # Hashes every queued file that has been quiet for the debounce window, reports what changed
+        now = time.monotonic()
+        batch = {}
+        for name in [name for name, due in pending.items() if due <= now]:
+            del pending[name]
+            path = os.path.join(base, name)
+            try:
+                info = os.stat(path, follow_symlinks=False)
+            except FileNotFoundError:
+                info = None
+            except OSError as e:
+                report_error(e)
+                continue
+            if info is None or not stat.S_ISREG(info.st_mode):
+                if files.pop(name, None) is not None:
+                    emit({'event': 'removed', 'path': name})
+                continue
+            quiet = time.time_ns() - info.st_mtime_ns
+            if 0 <= quiet < debounce_ns: # Still being written, mtimes in the future are taken as settled
+                pending[name] = now + (debounce_ns - quiet) / 1e9
+                continue
+            signature = watch_signature(info)
+            if files.get(name) != signature:
+                batch[path] = (name, signature, info.st_size)
+        for path, future in unordered_map(executor, worker, batch, max(1, args.workers) * 4):
+            name, signature, size = batch[path]
+            try:
+                digest = future.result()
+                current = watch_signature(os.stat(path, follow_symlinks=False))
+            except FileNotFoundError:
+                pending[name] = now
+                continue
+            except OSError as e:
+                report_error(e)
+                continue
+            if current != signature: # Changed while it was being hashed
+                pending[name] = now
+                continue
+            emit({'event': 'modified' if name in files else 'added', 'path': name, 'size': size, 'digest': digest, 'algorithm': args.algorithm})
+            files[name] = signature
+            if stats:
+                stats.count('files hashed')
+                stats.count('bytes read', size)
+        if batch:
+            output.flush()
+
+    def handle(directory, name, mask): # One inotify event, directories are rescanned as a whole when they appear
+        now = time.monotonic()
+        if mask & IN_Q_OVERFLOW: # Events were dropped, only a full pass can tell what changed
+            scan()
+            return
+        if directory is None:
+            return
+        name = os.path.join(directory, name) if directory else name
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                for child, signature in scan_watch_tree(base, name, report_error, watch):
+                    if files.get(child) != signature:
+                        pending[child] = now
+            elif mask & IN_MOVED_FROM:
+                prefix = name + os.sep.encode()
+                for child in files:
+                    if child.startswith(prefix):
+                        pending[child] = now
+            return
+        if mask & (IN_MODIFY | IN_CREATE | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM):
+            pending[name] = now + args.debounce if mask & IN_MODIFY else now # Writes coalesce, anything else is checked at once
+            if stats:
+                stats.count('events')
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler) # Stops like Ctrl-C, so the output is flushed
+    if args.verbose >= 1:
+        print(f"Watching {root} with {'inotify' if notifier else f'polling every {args.watch_interval}s'}, debounce {args.debounce}s, {args.algorithm.upper()}", file=sys.stderr)
+    try:
+        with get_executor(args) as executor:
+            scan()
+            next_scan = time.monotonic() + args.watch_interval
+            while True:
+                settle()
+                now = time.monotonic()
+                due = min(pending.values(), default=None)
+                if notifier: # Blocks in the kernel until something happens, idle costs nothing
+                    for event in notifier.read(None if due is None else max(0, due - now)):
+                        handle(*event)
+                    if not notifier: # Fell back to polling while adding watches
+                        next_scan = now
+                    continue
+                time.sleep(max(0, min(next_scan, due if due is not None else next_scan) - now))
+                if time.monotonic() >= next_scan:
+                    scan()
+                    next_scan = time.monotonic() + args.watch_interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if notifier:
+            notifier.close()
+        if args.save:
+            output.close()
+        else:
+            output.flush()
+    if args.verbose >= 1:
+        print(f"Stopped watching {root}, {len(files)} files tracked", file=sys.stderr)
+    return 0
+
+
+def bench_memory(path, hash_func, buffer_size, data): # '--bench', Pure hashing speed on bytes already in memory, no I/O at all
+    return hash_func(data).digest()
+
+
+def bench_readinto(path, hash_func, buffer_size, data): # '--bench', The streaming engine used by -f
+    return digest_file(path, hash_func, buffer_size)
+
+
+def bench_nocache(path, hash_func, buffer_size, data): # '--bench', '--io nocache', Streaming with sequential hints and drop-behind
+    return digest_file(path, hash_func, buffer_size, 'nocache')
+
+
+def bench_direct(path, hash_func, buffer_size, data): # '--bench', '--io direct', O_DIRECT into an aligned buffer where the filesystem allows it
+    return digest_file(path, hash_func, buffer_size, 'direct')
+
+
+def bench_mmap(path, hash_func, buffer_size, data): # '--bench', '--mmap', Slices of a read-only mapping, no copy into user space
+    return digest_file(path, hash_func, buffer_size, mmap_threshold=1)
+
+
+def bench_readahead(path, hash_func, buffer_size, data): # '--bench', '--readahead', Reader thread and buffer ring ahead of the hashing thread
+    hasher = hash_func()
+    with open(path, 'rb', buffering=0) as f:
+        hash_chunks(iter_readahead_chunks(f, buffer_size), [hasher])
+    return hasher.digest()
+
+
+def bench_read(path, hash_func, buffer_size, data): # '--bench', Whole-file f.read() as byxhash did before streaming
+    with open(path, 'rb') as f:
+        return hash_func(f.read()).digest()
+
+
+BENCH_STRATEGIES = {
+    'memory': bench_memory,
+    'readinto': bench_readinto,
+    'nocache': bench_nocache,
+    'direct': bench_direct,
+    'mmap': bench_mmap,
+    'readahead': bench_readahead,
+    'read': bench_read,
+}
+
+
+def drop_page_cache(path): # '--bench', Evicts a file's clean pages so the next read comes from disk
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def get_peak_rss(): # '--bench', Process high-water mark in bytes, None where the resource module is missing, only meaningful in a fresh bench_cases child
+    try: # Unix only, peak RSS is left out of --bench results without it
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def write_bench_file(path, size): # '--bench', Random content so no layer can cheat with compression or zero pages
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining:
+            block = os.urandom(min(remaining, DEFAULT_BUFFER_SIZE))
+            f.write(block)
+            remaining -= len(block)
+        f.flush()
+        os.fsync(f.fileno()) # Dirty pages cannot be dropped, cold runs need them on disk first
+
+
+def time_bench_case(strategy, path, hash_func, buffer_size, data, cold): # '--bench', Repeats a case for BENCH_MIN_TIME, returns the best single run in seconds
+    best = None
+    total = 0.0
+    while total < BENCH_MIN_TIME or best is None:
+        if cold:
+            drop_page_cache(path)
+        start = time.perf_counter()
+        strategy(path, hash_func, buffer_size, data)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_cases(strategy_name, path, size, caches, args): # '--bench', Every algorithm, length and cache state of one strategy and size, run in a forked child so its peak RSS is that strategy's alone
+    strategy = BENCH_STRATEGIES[strategy_name]
+    data = open(path, 'rb').read() if strategy is bench_memory else None
+    results = []
+    for algorithm in MAX_DIGEST_SIZES:
+        for length in ([args.length] if args.length and algorithm != 'sha256' else BENCH_LENGTHS[algorithm]):
+            hash_func = get_hash_function(algorithm, length)
+            for cache in (['hot'] if strategy is bench_memory else caches):
+                if cache == 'hot':
+                    strategy(path, hash_func, args.buffer_size, data) # Warm up
+                best = time_bench_case(strategy, path, hash_func, args.buffer_size, data, cache == 'cold')
+                result = {
+                    'algorithm': algorithm, 'length': length, 'size': size,
+                    'strategy': strategy_name, 'cache': cache,
+                    'mb_per_s': size / best / 1e6, 'ns_per_op': best * 1e9,
+                }
+                results.append(result)
+                if args.verbose >= 1:
+                    print(
+                        f"{algorithm}-{length:<3} {size:>12} bytes {strategy_name:>9}/{cache:<4} "
+                        f"{result['mb_per_s']:10.1f} MB/s {result['ns_per_op']:14.0f} ns/op", file=sys.stderr
+                    )
+    peak_rss = get_peak_rss()
+    for result in results:
+        result['peak_rss'] = peak_rss
+    return results
+
+
+def bench_key(result): # '--bench-baseline', Identifies the same case across runs
+    return result['algorithm'], result['length'], result['size'], result['strategy'], result['cache']
+
+
+def compare_bench(results, baseline_path, tolerance): # '--bench-baseline', Prints cases slower than the baseline beyond tolerance, returns how many
+    import json
+    try:
+        with open(baseline_path) as f:
+            baseline = {bench_key(result): result for result in json.load(f)['results']}
+    except (IOError, ValueError, KeyError) as e:
+        print(f"Error reading baseline: {e}", file=sys.stderr)
+        return 1
+    regressions = 0
+    for result in results:
+        previous = baseline.get(bench_key(result))
+        if previous is None:
+            continue
+        result['baseline_mb_per_s'] = previous['mb_per_s']
+        if result['mb_per_s'] < previous['mb_per_s'] * (1 - tolerance):
+            regressions += 1
+            algorithm, length, size, strategy, cache = bench_key(result)
+            print(
+                f"REGRESSION {algorithm}-{length} {size} bytes {strategy}/{cache}: "
+                f"{result['mb_per_s']:.1f} MB/s vs {previous['mb_per_s']:.1f} MB/s", file=sys.stderr
+            )
+    return regressions
+
+
+def run_bench(args): # '--bench', Sweeps algorithms x digest lengths x sizes x read strategies x page cache state, returns the exit code
+    import json
+    import multiprocessing
+    import platform
+    import shutil
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    caches = ['hot', 'cold'] if hasattr(os, 'posix_fadvise') else ['hot']
+    # A forked child starts at the parent's small resident set, so every strategy reports its own peak instead of the largest one
+    # run so far, without fork the cases run in this process and peak RSS is left out
+    context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    bench_dir = tempfile.mkdtemp(prefix='byxhash-bench-', dir=args.bench_dir)
+    results = []
+    try:
+        for size in args.bench_sizes:
+            write_bench_file(os.path.join(bench_dir, f'input-{size}'), size)
+        for strategy_name in BENCH_STRATEGIES:
+            for size in args.bench_sizes:
+                path = os.path.join(bench_dir, f'input-{size}')
+                if context is None:
+                    cases = bench_cases(strategy_name, path, size, caches, args)
+                    for result in cases:
+                        result['peak_rss'] = None
+                else:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        cases = executor.submit(bench_cases, strategy_name, path, size, caches, args).result()
+                results.extend(cases)
+    except (IOError, ValueError) as e:
+        print(f"Error running benchmark: {e}", file=sys.stderr)
+        return 1
+    finally:
+        shutil.rmtree(bench_dir, ignore_errors=True)
+
+    regressions = compare_bench(results, args.bench_baseline, args.bench_tolerance) if args.bench_baseline else 0
+    report = {
+        'meta': {
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'buffer_size': args.buffer_size,
+            'peak_rss_note': 'high-water mark of the child process that ran the strategy at that size, null where fork is unavailable',
+        },
+        'results': results,
+    }
+    try:
+        output = open(args.save, 'w') if args.save else sys.stdout
+        json.dump(report, output, indent=2)
+        output.write('\n')
+        if args.save:
+            output.close()
+    except IOError as e:
+        print(f"Error saving to file: {e}", file=sys.stderr)
+        return 1
+    return 1 if regressions else 0
+
+
+def load_stats(args): # '--stats', Imports the shared byxstats module from its sibling directory, only when the flag is given
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'byxstats'))
+    try:
+        from byxstats import open_stats
+    except ImportError as e:
+        print(f"Error loading --stats support: {e}")
+        sys.exit(1)
+    return open_stats('byxhash', args.stats)
+
+
+def get_output_filename(args): # File output logic, if not specified '+_hash'
+    if args.save:
+        return args.save
+    elif args.file:
+        from pathlib import Path
+        file_path = Path(args.file)
+        return f"{file_path.stem}_hashed{file_path.suffix}"
+    return None
+
+def compare_hashes(computed_hashes, expected_hash, args): # '-c', '--compare', Hash comparison logic, matches if any computed digest is identical
+    match = expected_hash.lower() in [computed_hash.lower() for computed_hash in computed_hashes]
+    
+    if args.quiet:
+        print("MATCH" if match else "NO MATCH")
+        sys.exit(0 if match else 1)
+    
+    for computed_hash in computed_hashes:
+        print(f"Computed:  {computed_hash}")
+    print(f"Expected:  {expected_hash}")
+    print("-" * 50)
+    
+    if match:
+        print("MATCH - Hashes are identical")
+        sys.exit(0)
+    else:
+        print("NO MATCH - Hashes differ")
+        sys.exit(1)
+
+def main():
+    args = get_args()
+
+    if args.lookup: # '--lookup', Reverse digest lookup in the cache
+        sys.exit(lookup_paths(args.lookup, args))
+
+    if args.serve: # '--serve', Daemon mode
+        sys.exit(serve(args.serve, args))
+
+    if args.bench: # '--bench', Benchmark mode
+        sys.exit(run_bench(args))
+    
+    if args.length and args.length != 32 and 'sha256' in args.algorithms:
+        print("Warning: sha256 has fixed length of 32 bytes, ignoring -l argument")
+    try:
+        hash_funcs =(
+            [get_hash_function(algorithm, algorithm_length(algorithm, args.length)) for algorithm in args.algorithms]
+            )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    hash_func = hash_funcs[0]
+
+    stats =( # '--stats', Reported on stderr at exit, whichever mode exits
+        load_stats(args) if args.stats else None
+    )
+
+    if len(hash_funcs) > 1 and (args.recursive or args.check or args.find_duplicates or args.watch or args.archive or args.cdc or args.tree or args.lines or args.null_data): # Manifests and records hold a single digest each
+        print("Error: Multiple algorithms are only supported for single inputs")
+        sys.exit(1)
+
+    if (args.similarity or args.similar) and (len(hash_funcs) > 1 or args.algorithm != 'blake2b' or args.length):
+        print("Error: --similarity signatures always use 64-bit blake2b chunk features, -a and -l do not apply")
+        sys.exit(1)
+    if (args.similarity or args.similar) and (not args.cdc_min <= args.cdc_avg <= args.cdc_max or args.cdc_avg & (args.cdc_avg - 1) or args.cdc_avg < 4):
+        print("Error: --cdc-avg must be a power of two, at least 4, between --cdc-min and --cdc-max")
+        sys.exit(1)
+    if args.similar and not args.index:
+        print("Error: --similar requires --index FILE")
+        sys.exit(1)
+    if args.similarity and (args.check or args.sample or args.cdc or args.tree or args.tee or args.connect or args.lines or args.null_data or args.watch or args.archive or args.find_duplicates):
+        print("Error: --similarity works on single inputs and -r only")
+        sys.exit(1)
+    if args.similar: # '--similar', Index query mode
+        sys.exit(find_similar(args.similar, args, stats))
+
+    if args.sample and (len(hash_funcs) > 1 or args.algorithm != 'blake2b'):
+        print("Error: --sample fingerprints always use blake2b")
+        sys.exit(1)
+    if args.sample and args.sample_blocks < 2:
+        print("Error: --sample-blocks must be at least 2 (head and tail)")
+        sys.exit(1)
+
+    if args.archive: # '--archive', Archive member manifest mode
+        sys.exit(hash_archive(args.archive, hash_func, args, stats))
+
+    if args.watch: # '--watch', Live manifest mode
+        sys.exit(watch_directory(args.watch, hash_func, args, stats))
+
+    if args.find_duplicates: # '--find-duplicates', Duplicate finder mode
+        sys.exit(find_duplicates(args.find_duplicates, hash_func, args, stats))
+
+    if args.recursive: # '-r', '--recursive', Directory manifest mode
+        sys.exit(hash_directory(args.recursive, hash_func, args, stats))
+
+    if args.check: # '--check', Manifest verification mode
+        sys.exit(check_manifest(args.check, args, stats))
+    
+    if args.sample: # '--sample', Fingerprint mode, needs a seekable file
+        if not args.file:
+            print("Error: --sample requires -f FILE, -r DIR or --check MANIFEST")
+            sys.exit(1)
+        sys.exit(sample_input(args))
+    
+    if args.tree and (args.algorithm not in TREE_CONSTRUCTORS or not args.file): # '--tree', '--incremental', Needs BLAKE2 and a seekable file
+        print("Error: --tree and --incremental require -f FILE and the blake2b or blake2s algorithm")
+        sys.exit(1)
+    if args.tree and args.connect:
+        print("Error: --tree and --incremental cannot be combined with --connect")
+        sys.exit(1)
+    if args.tree and args.leaf_size > 0xFFFFFFFF:
+        print("Error: --leaf-size must be below 4 GiB")
+        sys.exit(1)
+
+    if args.cdc and (args.tree or args.tee or args.connect or args.lines or args.null_data):
+        print("Error: --cdc cannot be combined with --tree, --tee, --connect or record mode")
+        sys.exit(1)
+    if args.tee and (args.lines or args.null_data): # '--tee' forwards the raw stream and reports one digest, records would be silently ignored
+        print("Error: --tee cannot be combined with record mode (--lines or -z)")
+        sys.exit(1)
+    if args.cdc and not args.cdc_min <= args.cdc_avg <= args.cdc_max:
+        print("Error: --cdc sizes must satisfy --cdc-min <= --cdc-avg <= --cdc-max")
+        sys.exit(1)
+    if args.cdc and (args.cdc_avg & (args.cdc_avg - 1) or args.cdc_avg < 4):
+        print("Error: --cdc-avg must be a power of two, at least 4")
+        sys.exit(1)
+
+    if args.decompress and (args.tree or args.connect or args.input is not None and not args.file):
+        print("Error: --decompress needs -f FILE or stdin and cannot be combined with --tree, --incremental or --connect")
+        sys.exit(1)
+
+    input_stream, input_source =(
+        get_input_data(args)
+    )
+    if args.decompress: # '--decompress', Everything downstream sees the decompressed bytes
+        if args.file and is_direct(input_stream.fileno()): # Decompressors make small unaligned reads
+            clear_direct(input_stream.fileno())
+        try:
+            input_stream, args.decompress =(
+                open_decompressed(input_stream, args.decompress, args.buffer_size)
+            )
+        except (IOError, ValueError) as e:
+            print(f"Error reading input: {e}")
+            sys.exit(1)
+        input_source += f" ({args.decompress})"
+
+    if args.similarity: # '--similarity', Signature mode, after --decompress so compressed inputs are compared by content
+        if args.index and not args.file:
+            print("Error: --index needs -f FILE or -r DIR, stdin has no path to record")
+            sys.exit(1)
+        try:
+            sys.exit(similarity_input(input_stream, args, stats))
+        except IOError as e:
+            print(f"Error reading input: {e}")
+            sys.exit(1)
+
+    if args.cdc: # '--cdc', Chunk listing mode
+        try:
+            sys.exit(cdc_input(input_stream, hash_func, args, stats))
+        except IOError as e:
+            print(f"Error reading input: {e}")
+            sys.exit(1)
+    
+    if args.tee: # '--tee', Passthrough mode, stdout carries the data so messages go to stderr
+        try:
+            sys.exit(tee_input(input_stream, [hash_func() for hash_func in hash_funcs], args, stats))
+        except IOError as e:
+            print(f"Error forwarding input: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    client = None
+    if args.connect: # '--connect', Client mode
+        try:
+            client = DaemonClient(args.connect)
+        except OSError as e:
+            print(f"Error connecting to daemon: {e}")
+            sys.exit(1)
+
+    if args.lines or args.null_data: # '--lines', '-z', Record mode
+        try:
+            sys.exit(hash_records(input_stream, hash_func, args, client, stats))
+        except IOError as e:
+            print(f"Error reading input: {e}")
+            sys.exit(1)
+
+    output_file =(
+        get_output_filename(args)
+    )
+
+    hashers = [hash_func() for hash_func in hash_funcs]
+    extents = {} # '--sparse', Data and hole byte counts, filled in while reading
+    incremental = None # '--incremental', (leaves reused, bytes read, reason for a full rehash)
+    cache =( # File input only, not at '-vv' which needs the actual bytes, and not for '-c' unless --trust-cache
+        open_cache(args) if args.file and args.verbose < 2 and not client and (args.trust_cache or not args.compare) else None
+    )
+    cache_algorithms =( # Tree digests depend on the leaf size and decompressed ones on the format, so they get their own cache entries
+        [f"{algorithm}-tree-{args.leaf_size}" if args.tree else f"{algorithm}-{args.decompress}" if args.decompress else algorithm for algorithm in args.algorithms]
+    )
+    hashed_inputs =(
+        [cache.lookup(args.file, algorithm, hasher.digest_size) for algorithm, hasher in zip(cache_algorithms, hashers)]
+        if cache else [None] * len(hashers)
+    )
+    from_cache = None not in hashed_inputs
+    try:
+        if from_cache: # Every digest came from the cache, the file is never read
+            input_length, input_head = os.fstat(input_stream.fileno()).st_size, b''
+        elif client:
+            input_length, input_head, hashed_inputs =(
+                remote_input(client, input_stream, args, hashers)
+            )
+            client.close()
+        elif args.incremental:
+            hashed_input, input_length, *incremental =(
+                hash_incremental(input_stream.fileno(), args.algorithm, hashers[0].digest_size, args.leaf_size, args.workers, get_checkpoint_path(args), args.io)
+            )
+            hashed_inputs = [hashed_input]
+            input_head = os.pread(input_stream.fileno(), 100, 0) if args.verbose >= 2 else b''
+            if stats:
+                stats.lap('read and hash')
+                stats.count('bytes read', incremental[1])
+                stats.count('leaves reused', incremental[0])
+        elif args.tree:
+            hashed_input, input_length =(
+                hash_tree(input_stream.fileno(), args.algorithm, hashers[0].digest_size, args.leaf_size, args.workers, args.io)
+            )
+            hashed_inputs = [hashed_input]
+            input_head = os.pread(input_stream.fileno(), 100, 0) if args.verbose >= 2 else b''
+            if stats: # Leaves are read and hashed together on the pool, so the stages cannot be split
+                stats.lap('read and hash')
+                stats.count('bytes read', input_length)
+        else:
+            chunks = iter_input_chunks(input_stream, args, extents)
+            if stats:
+                chunks = stats.timed_iter(chunks, 'read', 'hash', 'bytes read')
+            with get_hasher_executor(hashers, args) as executor:
+                input_length, input_head =(
+                    hash_chunks(chunks, hashers, executor)
+                )
+            hashed_inputs = [hasher.hexdigest() for hasher in hashers]
+        if cache:
+            for algorithm, hasher, hashed_input in zip(cache_algorithms, hashers, hashed_inputs):
+                cache.store(args.file, algorithm, hasher.digest_size, hashed_input)
+    except IOError as e:
+        print(f"Error reading input: {e}")
+        sys.exit(1)
+    finally:
+        if args.file:
+            input_stream.close()
+        if cache:
+            cache.close()
+    if stats and cache:
+        stats.count('cache hits', cache.hits)
+        stats.count('cache misses', cache.misses)
+    if stats and extents:
+        stats.count('hole bytes', extents['hole'])
+
+    if args.compare: # '-c', '--compare', Compare computed hashes with expected
+        compare_hashes(hashed_inputs, args.compare, args)
+        return
+
+    if args.quiet: # '-q', '--quiet', Outputs Hashes Quietly, one per line in '-a' order
+        for hashed_input in hashed_inputs:
+            print(hashed_input)
+        
+        if output_file:
+            try:
+                with open(output_file, 'w') as f:
+                    f.write(''.join(hashed_input + '\n' for hashed_input in hashed_inputs))
+            except IOError as e:
+                print(f"\nError saving to file: {e}")
+        return
+    
+    if args.verbose >= 1: # '-v', Verbosity Lvl 1
+        print(f"Input source: {input_source}")
+        print(f"Input length: {input_length} bytes" + (" on disk (compressed, the decompressed length is not cached)" if from_cache and args.decompress else ""))
+        print(f"Algorithm: {', '.join(algorithm.upper() for algorithm in args.algorithms)}")
+        if args.length:
+            print(f"Hash length: {args.length} bytes")
+        if args.file and args.io != 'default':
+            print(f"I/O mode: {args.io}")
+        if extents:
+            print(f"Sparse: {extents['data']} data bytes, {extents['hole']} hole bytes ({extents['hole'] * 100 / (input_length or 1):.1f}% holes)")
+        if args.tree:
+            print(f"Tree mode: {max(1, -(-input_length // args.leaf_size))} leaves of {args.leaf_size} bytes (fanout 0, depth 2)")
+        if incremental: # Not on a cache hit, the checkpoint is never opened then
+            print(f"Incremental: {incremental[0]} leaves reused from {get_checkpoint_path(args)}, {incremental[1]} bytes read" + (f" (full rehash: {incremental[2]})" if incremental[2] else " (append-only: first and last reused leaves re-verified)" if incremental[0] else ""))
+        if cache:
+            print(f"Cache: {'hit' if cache.hits == len(hashers) else 'miss'}")
+        print("-" * 50)
+    
+    if args.verbose >= 2: # '-vv', Verbosity Lvl 2
+        print(f"Input as bytes: {input_head[:100]}{'...' if input_length > 100 else ''}")
+        print(f"Input hex: {input_head[:50].hex()}{'...' if input_length > 50 else ''}")
+        print(f"Processing with {', '.join(algorithm.upper() for algorithm in args.algorithms)} algorithm{'s' if len(hashers) > 1 else ''}...")
+        print("-" * 50)
+    
+    for algorithm, hashed_input in zip(args.algorithms, hashed_inputs):
+        label = f"Hash ({algorithm.upper()})" if len(hashed_inputs) > 1 else "Hash"
+        print(f"{label}: {hashed_input}")
+        
+        if args.verbose >= 1: # '-v' + '-vv', Verbose output statement
+            actual_length = len(hashed_input) // 2
+            print(f"Hash length: {len(hashed_input)} hex characters ({actual_length} bytes)")
+    
+    if output_file: # Save to file
+        try:
+            with open(output_file, 'w') as f:
+                f.write(''.join(hashed_input + '\n' for hashed_input in hashed_inputs))
+            print(f"\nHash{'es' if len(hashed_inputs) > 1 else ''} saved to: {output_file}")
+        except IOError as e:
+            print(f"\nError saving to file: {e}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+import byxhash_core
+
+LEAF_SIZE = 64 * 1024
+
+
+class IncrementalTest(unittest.TestCase): # '--incremental', Reused leaves must always give the same root as a full '--tree' pass
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'data')
+        self.checkpoint = self.path + byxhash_core.CHECKPOINT_SUFFIX
+        self.write(os.urandom(3_000_000))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, data, offset=None):
+        with open(self.path, 'r+b' if offset is not None else 'ab') as f:
+            if offset is not None:
+                f.seek(offset)
+            f.write(data)
+
+    def hash(self):
+        with open(self.path, 'rb') as f:
+            root, size, reused, read, reason = byxhash_core.hash_incremental(f.fileno(), 'blake2b', 64, LEAF_SIZE, 2, self.checkpoint)
+            self.assertEqual((root, size), byxhash_core.hash_tree(f.fileno(), 'blake2b', 64, LEAF_SIZE, 2))
+        return reused, read, reason
+
+    def test_first_run_hashes_everything(self):
+        self.assertEqual(self.hash(), (0, 3_000_000, 'no checkpoint'))
+
+    def test_append_reuses_complete_leaves(self):
+        self.hash()
+        self.write(os.urandom(100_000))
+        reused, read, reason = self.hash()
+        self.assertEqual((reused, reason), (3_000_000 // LEAF_SIZE, None))
+        self.assertEqual(read, 3_100_000 - reused * LEAF_SIZE + 2 * LEAF_SIZE)
+
+    def test_rewritten_first_leaf_forces_full_rehash(self):
+        self.hash()
+        self.write(os.urandom(100_000))
+        self.write(b'X', 10)
+        self.assertEqual(self.hash()[::2], (0, 'earlier content changed'))
+
+    def test_rewritten_last_reused_leaf_forces_full_rehash(self):
+        self.hash()
+        self.write(b'X', (3_000_000 // LEAF_SIZE) * LEAF_SIZE - 1)
+        self.assertEqual(self.hash()[::2], (0, 'earlier content changed'))
+
+    def test_truncation_drops_leaves_past_the_end(self):
+        self.hash()
+        os.truncate(self.path, 1_000_000)
+        self.assertEqual(self.hash()[::2], (1_000_000 // LEAF_SIZE, None))
+
+    def test_replaced_file_is_rehashed(self):
+        self.hash()
+        os.replace(self.path, self.path + '.old')
+        with open(self.path + '.old', 'rb') as source, open(self.path, 'wb') as target:
+            target.write(source.read())
+        self.assertEqual(self.hash()[::2], (0, 'file was replaced'))
+
+
+if __name__ == '__main__':
+    unittest.main()
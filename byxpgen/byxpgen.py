@@ -218,6 +218,10 @@ def get_args():
         '-f', '--file', type=str, metavar='FILE',
         help='Save generated passwords to file'
         )
+    parser.add_argument(
+        '--stats', type=str, nargs='?', const='text', choices=['text', 'json'],
+        help='Report generation time, RNG calls, requirement rejections and output bytes on stderr, as text [Default] or json'
+        )
     group.add_argument(
         '-q', '--quiet', action='store_true',
         help='Quiet mode, only output passwords'
@@ -320,12 +324,15 @@ def meets_requirements(password, args): # Check if password meets minimum requir
     return True
 
 
-def generate_password(length, charset, args): # Generate cryptographically secure password
+def generate_password(length, charset, args, stats=None): # Generate cryptographically secure password
     max_attempts = 10000
     
-    for _ in range(max_attempts):
+    for attempt in range(max_attempts):
         password = ''.join(secrets.choice(charset) for _ in range(length))
         if meets_requirements(password, args):
+            if stats: # '--stats', One secrets.choice call per character of every attempt
+                stats.count('rng calls', (attempt + 1) * length)
+                stats.count('meets_requirements rejections', attempt)
             return password
     
     print("Error: Could not generate password meeting minimum requirements.")
@@ -333,8 +340,10 @@ def generate_password(length, charset, args): # Generate cryptographically secur
     sys.exit(1)
 
 
-def generate_passphrase(words, separator, wordlist): # '-p', '--passphrase', Generate memorable passphrase
+def generate_passphrase(words, separator, wordlist, stats=None): # '-p', '--passphrase', Generate memorable passphrase
     selected_words = [secrets.choice(wordlist) for _ in range(words)]
+    if stats:
+        stats.count('rng calls', words)
     return separator.join(selected_words)
 
 
@@ -355,8 +364,22 @@ def read_stdin_params(): # Read generation parameters from stdin
     return params
 
 
+def load_stats(args): # '--stats', Imports the shared byxstats module from its sibling directory, only when the flag is given
+    from pathlib import Path # Only needed here, importing it up front costs every run a few milliseconds
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'byxstats'))
+    try:
+        from byxstats import open_stats
+    except ImportError as e:
+        print(f"Error loading --stats support: {e}")
+        sys.exit(1)
+    return open_stats('byxpgen', args.stats)
+
+
 def main():
     args = get_args()
+    stats =( # '--stats', Reported on stderr at exit
+        load_stats(args) if args.stats else None
+    )
     
     stdin_params = read_stdin_params()
     if stdin_params:
@@ -375,9 +398,11 @@ def main():
         if not wordlist:
             print("Error: No wordlist available. Please provide a wordlist with -W or add words to DEFAULT_WORDLIST.")
             sys.exit(1)
+        if stats:
+            stats.lap('setup')
         
         for _ in range(args.count):
-            passphrase = generate_passphrase(args.words, args.separator, wordlist)
+            passphrase = generate_passphrase(args.words, args.separator, wordlist, stats)
             passwords.append(passphrase)
         
         charset_size = len(wordlist)
@@ -390,14 +415,20 @@ def main():
         if total_min > args.length:
             print(f"Error: Minimum requirements ({total_min}) exceed password length ({args.length})")
             sys.exit(1)
+        if stats:
+            stats.lap('setup')
         
         for _ in range(args.count):
-            password = generate_password(args.length, charset, args)
+            password = generate_password(args.length, charset, args, stats)
             passwords.append(password)
         
         charset_size = len(set(charset))
         avg_length = sum(len(p) for p in passwords) / len(passwords)
     
+    if stats:
+        stats.lap('generate')
+        stats.count('passwords', len(passwords))
+    
     if args.quiet: # '-q', '--quiet', Outputs passwords quietly
         for pwd in passwords:
             print(pwd)
@@ -440,6 +471,9 @@ def main():
                 print(f"  Symbols: {sum(1 for c in sample_pwd if c in string.punctuation)}")
                 print(f"\nCharacter set preview: {charset[:50]}{'...' if len(charset) > 50 else ''}")
     
+    if stats:
+        stats.lap('print')
+    
     if args.file: # '-f', '--file', Save passwords to file
         try:
             with open(args.file, 'w') as f:
@@ -450,6 +484,8 @@ def main():
         except IOError as e:
             print(f"\nError saving to file: {e}")
             sys.exit(1)
+        if stats:
+            stats.lap('save')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,101 @@
+import json
+import sys
+import time
+from time import perf_counter_ns
+
+# Shared '--stats' instrumentation for byxhash and byxpgen. The tools only import this module when --stats is given,
+# so with the flag off the hot paths pay one 'if stats' check per stage, never per byte or per character.
+
+END = object()
+
+
+class CountingWriter: # Text stream proxy that counts the encoded bytes written through it, everything else is passed to the real stream
+    def __init__(self, stream, stats, counter):
+        self.stream = stream
+        self.stats = stats
+        self.counter = counter
+
+    def write(self, text):
+        self.stats.count(self.counter, len(text.encode(self.stream.encoding or 'utf-8', 'replace')))
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class Stats: # Counters and monotonic stage timers, everything is kept in nanoseconds and only formatted by report()
+    def __init__(self, tool, output_format='text'):
+        self.tool = tool
+        self.output_format = output_format
+        self.counters = {}
+        self.timers = {}
+        self.started = self.mark = perf_counter_ns()
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name, elapsed):
+        self.timers[name] = self.timers.get(name, 0) + elapsed
+
+    def lap(self, name): # Charges the time since the previous lap to 'name', for stages that run one after another
+        now = perf_counter_ns()
+        self.add_time(name, now - self.mark)
+        self.mark = now
+
+    def timed_iter(self, iterable, produce, consume, counter=None): # Splits a pipeline between producing each item (e.g. reads) and the consumer's work on it (e.g. hashing)
+        produced = consumed = total = 0
+        iterator = iter(iterable)
+        try:
+            while True:
+                start = perf_counter_ns()
+                item = next(iterator, END)
+                produced += perf_counter_ns() - start
+                if item is END:
+                    break
+                if counter:
+                    total += len(item)
+                start = perf_counter_ns()
+                yield item
+                consumed += perf_counter_ns() - start
+        finally:
+            self.add_time(produce, produced)
+            self.add_time(consume, consumed)
+            if counter:
+                self.count(counter, total)
+
+    def wrap_stdout(self, counter='output bytes'): # Counts what print() sends to stdout, binary writers count their own output
+        sys.stdout = CountingWriter(sys.stdout, self, counter)
+
+    def as_dict(self):
+        return {
+            'tool': self.tool,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'wall_ns': perf_counter_ns() - self.started,
+            'timers_ns': self.timers,
+            'counters': self.counters,
+        }
+
+    def report(self, file=None): # Human summary or a single JSON line, on stderr so it never mixes with the tool's output
+        file = file or sys.stderr
+        result = self.as_dict()
+        if self.output_format == 'json':
+            print(json.dumps(result, sort_keys=True), file=file)
+            return
+        wall = result['wall_ns'] or 1
+        print(f"{self.tool} stats", file=file)
+        print(f"  {'wall time':<32} {wall / 1e6:>12.3f} ms", file=file)
+        for name, elapsed in self.timers.items():
+            print(f"  {name + ' time':<32} {elapsed / 1e6:>12.3f} ms  {elapsed * 100 / wall:5.1f}%", file=file)
+        for name, value in self.counters.items():
+            print(f"  {name:<32} {value:>12}", file=file)
+        for stage in ('read', 'hash'): # Per-stage throughput over the bytes that went through it
+            if self.counters.get('bytes read') and self.timers.get(stage):
+                print(f"  {stage + ' throughput':<32} {self.counters['bytes read'] * 1e3 / self.timers[stage]:>12.1f} MB/s", file=file)
+
+
+def open_stats(tool, output_format): # Builds the collector, wraps stdout and reports when the process exits, including via sys.exit
+    import atexit
+    stats = Stats(tool, output_format)
+    stats.wrap_stdout()
+    atexit.register(stats.report)
+    return stats